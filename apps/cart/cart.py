@@ -1,49 +1,117 @@
 from decimal import Decimal
 from django.conf import settings
-from catalog.models import ProductVariant
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
+from catalog.images import ImageResolver
+from catalog.models import AttributeValue, ProductVariant
 from coupons.models import Coupon
 
 
+def get_cart(request):
+    """Return the cart shared by the views and context processors of a request."""
+    if not hasattr(request, '_cart'):
+        request._cart = Cart(request)
+    return request._cart
+
+
+async def aget_cart(request):
+    """get_cart() for async views; loads the session without blocking.
+
+    Lines and coupon are still queried lazily, call ``Cart.aload()``
+    before rendering them.
+    """
+    # a loaded session is cached, so Cart reads it without I/O
+    await request.session.aget(settings.CART_SESSION_ID)
+    return get_cart(request)
+
+
 class Cart:
+    # memoized per request, dropped whenever the cart contents change
+    cached_attrs = ('lines', 'total_price', 'coupon')
+
     def __init__(self, request):
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        # an empty cart is only written to the session once something is added
+        self.cart = self._load(self.session.get(settings.CART_SESSION_ID))
         self.coupon_id = self.session.get('coupon_id')
 
-    def __iter__(self):
-        variant_ids = self.cart.keys()
-        variants = ProductVariant.objects.filter(id__in=variant_ids).select_related('product')
-        cart = self.cart.copy()
-
-        for variant in variants:
-            item = cart[str(variant.id)].copy()
-
+    def _variants(self):
+        return ProductVariant.objects.filter(
+            id__in=self.cart.keys()
+        ).select_related('product').prefetch_related(
+            Prefetch('attributes', queryset=AttributeValue.objects.select_related('attribute')),
+        )
+
+    @cached_property
+    def lines(self):
+        variants = list(self._variants())
+        images = ImageResolver.for_products(variant.product_id for variant in variants)
+        return self._build_lines(variants, images)
+
+    def _build_lines(self, variants, images):
+        variants = {str(variant.id): variant for variant in variants}
+
+        lines = []
+        for variant_id, quantity in self.cart.items():
+            variant = variants.get(variant_id)
+            if variant is None:
+                continue
+
+            item = {"quantity": quantity}
             item["product"] = variant.product
             item["variant"] = variant
             item["price"] = variant.price
             item["total_price"] = item["price"] * item["quantity"]
-            yield item
+            image = images.get_image(variant)
+            item["image_url"] = image.image.url if image and image.image else None
+            item["image_renditions"] = image.get_renditions() if image else {}
+            lines.append(item)
+        return lines
+
+    async def aload(self):
+        """Fill the memoized lines and coupon with async queries."""
+        if 'lines' not in self.__dict__:
+            variants = [variant async for variant in self._variants()]
+            images = await ImageResolver.afor_products(
+                variant.product_id for variant in variants
+            )
+            self.lines = self._build_lines(variants, images)
+        if 'coupon' not in self.__dict__:
+            self.coupon = await self._coupons().afirst() if self.coupon_id else None
+
+    def __iter__(self):
+        return iter(self.lines)
 
     def __len__(self):
-        return sum(item["quantity"] for item in self.cart.values())
+        return sum(self.cart.values())
+
+    @staticmethod
+    def _load(data):
+        # Carts are stored as {variant_id: quantity}; older sessions still
+        # hold {variant_id: {"quantity": n}}.
+        return {
+            variant_id: value["quantity"] if isinstance(value, dict) else value
+            for variant_id, value in (data or {}).items()
+        }
 
     def add(self, variant, quantity=1, override_quantity=False):
         variant_id = str(variant.id)
-        if variant_id not in self.cart:
-            self.cart[variant_id] = {"quantity": 0}
-
         if override_quantity:
-            self.cart[variant_id]["quantity"] = quantity
+            self.cart[variant_id] = quantity
         else:
-            self.cart[variant_id]["quantity"] += quantity
+            self.cart[variant_id] = self.cart.get(variant_id, 0) + quantity
 
         self.save()
 
     def save(self):
-        self.session.modified = True
+        # the session is only marked dirty when the stored cart changes
+        if self.session.get(settings.CART_SESSION_ID) != self.cart:
+            self.session[settings.CART_SESSION_ID] = dict(self.cart)
+        self._invalidate()
+
+    def _invalidate(self):
+        for attr in self.cached_attrs:
+            self.__dict__.pop(attr, None)
 
     def remove(self, variant):
         variant_id = str(variant.id)
@@ -52,26 +120,32 @@ class Cart:
             del self.cart[variant_id]
             self.save()
 
+    @cached_property
+    def total_price(self):
+        return sum((Decimal(item["price"]) * item["quantity"] for item in self), Decimal(0))
+
     def get_total_price(self):
-        return sum(Decimal(item["price"]) * item["quantity"] for item in self)
+        return self.total_price
 
     @property
     def unique_count(self):
         return len(self.cart)
 
     def clear(self):
-        del self.session[settings.CART_SESSION_ID]
-        if 'coupon_id' in self.session:
-            del self.session['coupon_id']
-        self.save()
+        self.session.pop(settings.CART_SESSION_ID, None)
+        self.session.pop('coupon_id', None)
+        self.cart = {}
+        self.coupon_id = None
+        self.session.modified = True
+        self._invalidate()
 
-    @property
+    def _coupons(self):
+        return Coupon.objects.filter(id=self.coupon_id)
+
+    @cached_property
     def coupon(self):
         if self.coupon_id:
-            try:
-                return Coupon.objects.get(id=self.coupon_id)
-            except Coupon.DoesNotExist:
-                pass
+            return self._coupons().first()
         return None
 
     def get_discount(self):
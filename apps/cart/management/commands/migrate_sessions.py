@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cart.cart import Cart
+from cart.session_store import SessionStore
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy live database sessions into the session cache and convert "
+        "their carts to the compact format. Users stay logged in."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many sessions would be migrated.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        store = SessionStore()
+        now = timezone.now()
+
+        sessions = Session.objects.filter(expire_date__gt=now).order_by("pk")
+        total = converted = 0
+        batch = []
+        for session in sessions.iterator(chunk_size=batch_size):
+            total += 1
+            data = store.decode(session.session_data)
+
+            cart = data.get(settings.CART_SESSION_ID)
+            compact = Cart._load(cart)
+            if cart and compact != cart:
+                data[settings.CART_SESSION_ID] = compact
+                converted += 1
+                if not options["dry_run"]:
+                    session.session_data = store.encode(data)
+                    batch.append(session)
+
+            if options["dry_run"]:
+                continue
+            timeout = (session.expire_date - now).total_seconds()
+            cache.set(store.cache_key_prefix + session.pk, data, timeout)
+            if len(batch) >= batch_size:
+                Session.objects.bulk_update(batch, ["session_data"])
+                batch = []
+
+        if batch:
+            Session.objects.bulk_update(batch, ["session_data"])
+
+        verb = "Would migrate" if options["dry_run"] else "Migrated"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {total} sessions ({converted} carts converted)"
+            )
+        )
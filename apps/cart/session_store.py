@@ -0,0 +1,89 @@
+import logging
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+logger = logging.getLogger("django.contrib.sessions")
+
+
+class SessionStore(CachedDBStore):
+    """Redis-first sessions with a coalesced database copy.
+
+    Reads are served from the cache and fall back to ``django_session``.
+    Saves that do not change the session are dropped, and the database
+    row is written at most once per ``SESSION_DB_SYNC_INTERVAL`` seconds;
+    writes in between go to the cache and are flushed by a delayed task.
+    New sessions (including key rotation on login) always hit the database.
+    """
+
+    @property
+    def _sync_key(self):
+        return f"{self.cache_key}:db_synced"
+
+    @property
+    def _pending_key(self):
+        return f"{self.cache_key}:db_pending"
+
+    def _fingerprint(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        data = super().load()
+        self._saved_fingerprint = self._fingerprint(data)
+        return data
+
+    async def aload(self):
+        data = await super().aload()
+        self._saved_fingerprint = self._fingerprint(data)
+        return data
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        fingerprint = self._fingerprint(data)
+        if (
+            not must_create
+            and self.session_key is not None
+            and fingerprint == getattr(self, "_saved_fingerprint", None)
+        ):
+            return
+
+        interval = settings.SESSION_DB_SYNC_INTERVAL
+        if must_create or self.session_key is None or interval <= 0:
+            super().save(must_create)
+            if interval > 0:
+                self._cache.set(self._sync_key, True, interval)
+        elif self._cache.add(self._sync_key, True, interval):
+            super().save()
+        else:
+            self._save_to_cache_only(interval)
+        self._saved_fingerprint = fingerprint
+
+    def _save_to_cache_only(self, interval):
+        from .tasks import sync_session_to_db
+
+        try:
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+            if self._cache.add(self._pending_key, True, interval * 2):
+                sync_session_to_db.apply_async(
+                    (self.session_key,), countdown=interval
+                )
+        except Exception:
+            logger.exception("Deferred session write failed, writing through")
+            super().save()
+
+    def sync_to_db(self):
+        """Copy the cached session into its database row."""
+        self._cache.delete(self._pending_key)
+        data = self._cache.get(self.cache_key)
+        if data is None:
+            return False
+        self._session_cache = data
+        try:
+            DBStore.save(self)
+        except UpdateError:
+            # the row was removed (e.g. by clearsessions) while cached
+            DBStore.save(self, must_create=True)
+        self._cache.set(self._sync_key, True, settings.SESSION_DB_SYNC_INTERVAL)
+        return True
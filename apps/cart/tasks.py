@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .session_store import SessionStore
+
+
+@shared_task
+def sync_session_to_db(session_key):
+    """Persist the latest cached state of a session after a burst of writes."""
+    return SessionStore(session_key).sync_to_db()
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
@@ -5,7 +6,15 @@ from . import views
 app_name = "cart"
 
 urlpatterns = [
-    path("", views.cart_detail, name="cart_detail"),
-    path("add/<int:variant_id>/", views.cart_add, name="cart_add"),
+    path(
+        "",
+        views.cart_detail_async if settings.ASYNC_VIEWS else views.cart_detail,
+        name="cart_detail",
+    ),
+    path(
+        "add/<int:variant_id>/",
+        views.cart_add_async if settings.ASYNC_VIEWS else views.cart_add,
+        name="cart_add",
+    ),
     path("remove/<int:product_id>/", views.cart_remove, name="cart_remove"),
 ]
@@ -2,16 +2,16 @@ from catalog.models import Product, ProductVariant
 from catalog.recommender import Recommender
 from coupons.forms import CouponApplyForm
 from django.http import JsonResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.views.decorators.http import require_POST
 
-from .cart import Cart
+from .cart import aget_cart, get_cart
 from .forms import CartAddProductForm
 
 
 @require_POST
 def cart_add(request, variant_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     variant = get_object_or_404(ProductVariant, id=variant_id)
 
     form = CartAddProductForm(request.POST)
@@ -25,32 +25,67 @@ def cart_add(request, variant_id):
     return redirect("cart:cart_detail")
 
 
+@require_POST
+async def cart_add_async(request, variant_id):
+    cart = await aget_cart(request)
+    variant = await aget_object_or_404(ProductVariant, id=variant_id)
+
+    form = CartAddProductForm(request.POST)
+
+    if form.is_valid():
+        cd = form.cleaned_data
+        cart.add(
+            variant=variant, quantity=cd["quantity"], override_quantity=cd["override"]
+        )
+
+    return redirect("cart:cart_detail")
+
+
 @require_POST
 def cart_remove(request, product_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     variant = get_object_or_404(ProductVariant, id=product_id)
     cart.remove(variant)
     return redirect("cart:cart_detail")
 
 
 def cart_detail(request):
-    cart = Cart(request)
+    cart = get_cart(request)
+    cart_products = [item["product"] for item in cart]
 
-    for item in cart:
-        item["update_quantity_form"] = CartAddProductForm(
-            initial={"quantity": item["quantity"], "override": True}
+    if cart_products:
+        recommended_products = Recommender().suggest_products_for(
+            cart_products, max_results=4
         )
+    else:
+        recommended_products = []
+
+    return _render_cart(request, cart, recommended_products)
 
-    coupon_apply_form = CouponApplyForm(request.POST)
-    r = Recommender()
 
+async def cart_detail_async(request):
+    cart = await aget_cart(request)
+    await cart.aload()
     cart_products = [item["product"] for item in cart]
 
     if cart_products:
-        recommended_products = r.suggest_products_for(cart_products, max_results=4)
+        recommended_products = await Recommender().asuggest_products_for(
+            cart_products, max_results=4
+        )
     else:
         recommended_products = []
 
+    return _render_cart(request, cart, recommended_products)
+
+
+def _render_cart(request, cart, recommended_products):
+    for item in cart:
+        item["update_quantity_form"] = CartAddProductForm(
+            initial={"quantity": item["quantity"], "override": True}
+        )
+
+    coupon_apply_form = CouponApplyForm(request.POST)
+
     return render(
         request,
         "cart/detail.html",
@@ -0,0 +1,328 @@
+import csv
+import gzip
+import io
+import json
+import re
+import tempfile
+import zlib
+from datetime import timedelta
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .images import ImageResolver
+from .models import AttributeValue, ProductVariant
+
+CHUNK_SIZE = 2000
+
+# Products saved while a build was running may commit with an earlier
+# ``updated`` than the build start, so incremental builds look back a bit.
+SINCE_MARGIN = timedelta(minutes=5)
+
+
+def _one_line(text):
+    return " ".join(str(text).split())
+
+
+class Feed:
+    """One line per variant, ordered by variant id.
+
+    Keeping every item on its own line lets an incremental build copy
+    unchanged items from the previous file without parsing it.
+    """
+
+    # bump when the output changes, so the next build starts from scratch
+    version = 2
+    extension = None
+
+    def __init__(self):
+        self.base_url = settings.FEED_BASE_URL.rstrip("/")
+        self.currency = settings.FEED_CURRENCY
+
+    def absolute(self, url):
+        if not url or url.startswith(("http://", "https://")):
+            return url or ""
+        return f"{self.base_url}{url}"
+
+    def item(self, variant, image):
+        product = variant.product
+        attributes = [
+            (av.attribute.name, av.value) for av in variant.attributes.all()
+        ]
+        title = product.name
+        if attributes:
+            title += f" ({', '.join(value for _, value in attributes)})"
+        return {
+            "id": variant.id,
+            "sku": _one_line(variant.sku),
+            "item_group_id": product.id,
+            "title": _one_line(title),
+            "description": _one_line(product.description)[:5000],
+            "link": self.absolute(product.get_absolute_url()),
+            "image_link": self.absolute(
+                image.image.url if image and image.image else ""
+            ),
+            "price": f"{variant.price} {self.currency}",
+            "availability": "in stock" if variant.in_stock else "out of stock",
+            "brand": _one_line(product.brand.name),
+            "product_type": _one_line(product.category.name),
+            "attributes": attributes,
+        }
+
+    def header(self):
+        return ""
+
+    def footer(self):
+        return ""
+
+    def render(self, item):
+        raise NotImplementedError
+
+    def line_id(self, line):
+        raise NotImplementedError
+
+
+class CsvFeed(Feed):
+    extension = "csv"
+    columns = [
+        "id",
+        "sku",
+        "item_group_id",
+        "title",
+        "description",
+        "link",
+        "image_link",
+        "price",
+        "availability",
+        "brand",
+        "product_type",
+        "attributes",
+    ]
+
+    def _row(self, values):
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerow(values)
+        return buffer.getvalue()
+
+    def header(self):
+        return self._row(self.columns)
+
+    def render(self, item):
+        values = dict(item)
+        values["attributes"] = _one_line(
+            "; ".join(f"{name}: {value}" for name, value in item["attributes"])
+        )
+        return self._row([values[column] for column in self.columns])
+
+    def line_id(self, line):
+        head = line.split(",", 1)[0]
+        return int(head) if head.isdigit() else None
+
+
+class XmlFeed(Feed):
+    """Google Merchant Center RSS 2.0 feed."""
+
+    extension = "xml"
+    fields = [
+        "id",
+        "title",
+        "description",
+        "link",
+        "image_link",
+        "price",
+        "availability",
+        "brand",
+        "product_type",
+        "item_group_id",
+    ]
+    id_re = re.compile(r"<item><g:id>(\d+)</g:id>")
+
+    def header(self):
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n'
+            f"<channel><title>Products</title><link>{escape(self.base_url)}</link>"
+            "<description>Product feed</description>\n"
+        )
+
+    def footer(self):
+        return "</channel></rss>\n"
+
+    def render(self, item):
+        parts = [
+            f"<g:{field}>{escape(str(item[field]))}</g:{field}>" for field in self.fields
+        ]
+        parts.append(f"<g:mpn>{escape(item['sku'])}</g:mpn>")
+        for name, value in item["attributes"]:
+            parts.append(
+                "<g:product_detail>"
+                f"<g:attribute_name>{escape(_one_line(name))}</g:attribute_name>"
+                f"<g:attribute_value>{escape(_one_line(value))}</g:attribute_value>"
+                "</g:product_detail>"
+            )
+        return f"<item>{''.join(parts)}</item>\n"
+
+    def line_id(self, line):
+        match = self.id_re.match(line)
+        return int(match.group(1)) if match else None
+
+
+FEEDS = {feed.extension: feed for feed in (CsvFeed, XmlFeed)}
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _render_items(feed, variant_ids):
+    variants = list(
+        ProductVariant.objects.filter(id__in=variant_ids)
+        .select_related("product__brand", "product__category")
+        .prefetch_related(
+            Prefetch(
+                "attributes",
+                queryset=AttributeValue.objects.select_related("attribute").order_by(
+                    "attribute_id", "id"
+                ),
+            )
+        )
+    )
+    resolver = ImageResolver.for_products(v.product_id for v in variants)
+    return {
+        variant.id: feed.render(feed.item(variant, resolver.get_image(variant)))
+        for variant in variants
+    }
+
+
+def generate_feed(feed, since=None, previous=None, stats=None):
+    """Yield the feed in chunks of lines.
+
+    Variant ids are read through a server-side cursor. With ``previous``
+    (the lines of an earlier build) and ``since``, items of products not
+    updated since then are copied over and only the rest is rendered.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(rendered=0, reused=0)
+
+    old = (
+        (item_id, line)
+        for line in (previous or ())
+        if (item_id := feed.line_id(line)) is not None
+    )
+    pending = next(old, None)
+
+    yield feed.header()
+    rows = ProductVariant.objects.order_by("id").values_list("id", "product__updated")
+    for chunk in _chunks(rows.iterator(chunk_size=CHUNK_SIZE), CHUNK_SIZE):
+        last_id = chunk[-1][0]
+        reusable = {}
+        # both sides are sorted by id, so this is a merge join
+        while pending is not None and pending[0] <= last_id:
+            reusable[pending[0]] = pending[1]
+            pending = next(old, None)
+
+        stale = {
+            variant_id
+            for variant_id, updated in chunk
+            if since is None or variant_id not in reusable or updated >= since
+        }
+        fresh = _render_items(feed, stale) if stale else {}
+        stats["rendered"] += len(fresh)
+
+        lines = []
+        for variant_id, _ in chunk:
+            if variant_id in fresh:
+                lines.append(fresh[variant_id])
+            elif variant_id not in stale:
+                lines.append(reusable[variant_id])
+                stats["reused"] += 1
+        yield "".join(lines)
+    yield feed.footer()
+
+
+def gzip_stream(chunks):
+    """Gzip-compress an iterable of text chunks on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _manifest_name(fmt):
+    return f"feeds/products.{fmt}.json"
+
+
+def get_manifest(fmt):
+    """Where the current build of a feed is stored, or None."""
+    name = _manifest_name(fmt)
+    if not default_storage.exists(name):
+        return None
+    with default_storage.open(name) as f:
+        return json.load(f)
+
+
+def build_feed(fmt, full=False):
+    """Write a gzip-compressed feed to storage, reusing the last build."""
+    feed = FEEDS[fmt]()
+    manifest = get_manifest(fmt)
+    started = timezone.now()
+
+    since = None
+    previous = None
+    if (
+        not full
+        and manifest
+        and manifest.get("version") == feed.version
+        and default_storage.exists(manifest["name"])
+    ):
+        since = parse_datetime(manifest["built"]) - SINCE_MARGIN
+        previous = gzip.open(
+            default_storage.open(manifest["name"]), "rt", encoding="utf-8"
+        )
+
+    stats = {}
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            with gzip.GzipFile(fileobj=tmp, mode="wb") as out:
+                for chunk in generate_feed(feed, since, previous, stats):
+                    out.write(chunk.encode())
+            tmp.seek(0)
+            name = default_storage.save(
+                f"feeds/products-{started:%Y%m%d%H%M%S}.{fmt}.gz", File(tmp)
+            )
+    finally:
+        if previous is not None:
+            previous.close()
+
+    manifest_name = _manifest_name(fmt)
+    default_storage.delete(manifest_name)
+    default_storage.save(
+        manifest_name,
+        ContentFile(
+            json.dumps(
+                {
+                    "name": name,
+                    "built": started.isoformat(),
+                    "version": feed.version,
+                    "items": stats["rendered"] + stats["reused"],
+                }
+            )
+        ),
+    )
+    if manifest and manifest["name"] != name:
+        default_storage.delete(manifest["name"])
+
+    stats["name"] = name
+    stats["incremental"] = since is not None
+    return stats
@@ -1,7 +1,35 @@
+from functools import partial
+
 import django_filters
 from django import forms
-from django.db.models import Q
-from .models import Product, Brand, AttributeValue
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils.functional import cached_property
+from .models import Product, ProductVariant
+from .search import search_products
+from .taxonomy import get_taxonomy
+
+
+class FacetCheckboxSelectMultiple(forms.CheckboxSelectMultiple):
+    """Checkbox list that attaches facet counts to its options.
+
+    Options that would lead to an empty result are disabled unless checked.
+    Without counts (e.g. for invalid filters) every option stays enabled.
+    """
+
+    get_counts = None
+
+    def create_option(self, name, value, label, selected, index, subindex=None, attrs=None):
+        option = super().create_option(
+            name, value, label, selected, index, subindex=subindex, attrs=attrs
+        )
+        counts = self.get_counts() if self.get_counts is not None else None
+        if counts is not None:
+            pk = getattr(value, 'value', value)
+            option['count'] = counts.get(pk, 0)
+            if not option['count'] and not selected:
+                option['attrs']['disabled'] = True
+        return option
 
 
 class ProductFilter(django_filters.FilterSet):
@@ -12,31 +40,31 @@ class ProductFilter(django_filters.FilterSet):
         widget=forms.TextInput
     )
 
+    # A product has a variant priced >= X exactly when its most expensive
+    # variant is, so both bounds can be answered from the summary row.
     min_price = django_filters.NumberFilter(
-        field_name='variants__price',
+        field_name='summary__max_price',
         lookup_expr='gte',
         label='Min Price',
-        distinct=True,
         widget=forms.NumberInput
     )
 
     max_price = django_filters.NumberFilter(
-        field_name='variants__price',
+        field_name='summary__min_price',
         lookup_expr='lte',
         label='Max Price',
-        distinct=True,
         widget=forms.NumberInput
     )
 
-    brand = django_filters.ModelMultipleChoiceFilter(
-        queryset=Brand.objects.all(),
-        widget=forms.CheckboxSelectMultiple,
+    # choices come from the taxonomy snapshot in __init__
+    brand = django_filters.MultipleChoiceFilter(
+        widget=FacetCheckboxSelectMultiple,
         label='Brands'
     )
 
     o = django_filters.OrderingFilter(
         fields=(
-            ('variants__price', 'price'),
+            ('summary__min_price', 'price'),
             ('created', 'date'),
         ),
         field_labels={
@@ -55,19 +83,27 @@ class ProductFilter(django_filters.FilterSet):
         category = kwargs.pop('category', None)
         super().__init__(*args, **kwargs)
 
+        taxonomy = get_taxonomy()
+        self.filters['brand'].extra['choices'] = [
+            (brand.id, str(brand)) for brand in taxonomy.brands
+        ]
+        # option ids per facet
+        self.facet_options = {'brand': [brand.id for brand in taxonomy.brands]}
+
         if category:
-            for attr in category.available_attributes.all().prefetch_related('values'):
+            for attr in taxonomy.get_attributes(category):
                 filter_key = f'attr_{attr.slug}'
+                values = taxonomy.get_values(attr)
 
-                self.filters[filter_key] = django_filters.ModelMultipleChoiceFilter(
+                self.filters[filter_key] = django_filters.MultipleChoiceFilter(
                     field_name='variants__attributes',
-                    queryset=AttributeValue.objects.filter(attribute=attr),
-                    to_field_name='id',
+                    choices=[(value.id, str(value)) for value in values],
                     label=attr.name,
-                    widget=forms.CheckboxSelectMultiple,
+                    widget=FacetCheckboxSelectMultiple,
                     conjoined=False,
                     distinct=True
                 )
+                self.facet_options[filter_key] = [value.id for value in values]
 
         input_style = 'w-full bg-gray-50 border-2 border-black p-2 font-mono text-sm'
 
@@ -96,7 +132,72 @@ class ProductFilter(django_filters.FilterSet):
             if name.startswith('attr_'):
                 field.widget.attrs.update({'class': checkbox_style})
 
+        for name in self.facet_options:
+            self.form.fields[name].widget.get_counts = partial(self.get_facet_counts, name)
+
+    def get_facet_counts(self, name):
+        if self.facet_counts is None:
+            return None
+        return self.facet_counts.get(name, {})
+
+    def _facet_selection(self, name, values):
+        if name == 'brand':
+            return Q(brand__in=values)
+        return Q(Exists(
+            ProductVariant.objects.filter(product=OuterRef('pk'), attributes__in=values)
+        ))
+
+    def _facet_field(self, name):
+        return 'brand' if name == 'brand' else 'variants__attributes'
+
+    @cached_property
+    def facet_counts(self):
+        """Match counts per brand and attribute value, e.g.
+        {'brand': {brand_id: n}, 'attr_color': {value_id: n}}.
+
+        Each facet counts against every active filter except its own, so
+        users can widen a selection within a group. Facets sharing the same
+        other filters are counted by one grouped query, so a listing without
+        selections takes one query for brands and one for attribute values.
+        None when the filters are invalid and cannot be counted.
+        """
+        if not self.is_valid():
+            return None
+
+        base = self.queryset
+        selections = {}
+        for name, value in self.form.cleaned_data.items():
+            if name in self.facet_options:
+                if value:
+                    selections[name] = self._facet_selection(name, value)
+            elif name != 'o':
+                base = self.filters[name].filter(base, value)
+
+        groups = {}
+        for name, options in self.facet_options.items():
+            if options:
+                others = frozenset(other for other in selections if other != name)
+                groups.setdefault((self._facet_field(name), others), []).append(name)
+
+        counts = {name: {} for name in self.facet_options}
+        for (field, others), names in groups.items():
+            facet_of = {pk: name for name in names for pk in self.facet_options[name]}
+            products = Product.objects.filter(pk__in=base.values('pk'))
+            for other in others:
+                products = products.filter(selections[other])
+            rows = (
+                products.filter(**{f'{field}__in': facet_of})
+                .values_list(field)
+                .annotate(total=Count('pk', distinct=True))
+                .order_by()
+            )
+            for pk, total in rows:
+                counts[facet_of[pk]][pk] = total
+        return counts
+
     def filter_search(self, queryset, name, value):
+        if settings.CATALOG_SEARCH_MODE == 'fulltext':
+            return search_products(queryset, value)
         return queryset.filter(
             Q(name__icontains=value) | Q(description__icontains=value)
         ).distinct()
\ No newline at end of file
@@ -0,0 +1,39 @@
+from collections import defaultdict
+
+
+class ImageResolver:
+    """Pick variant images from product images loaded up front.
+
+    Images are grouped per product in their model ordering (main image
+    first), so resolving a variant never touches the database as long as
+    its attributes are prefetched.
+    """
+
+    def __init__(self, images):
+        self.images = defaultdict(list)
+        for image in images:
+            self.images[image.product_id].append(image)
+
+    @classmethod
+    def for_products(cls, product_ids):
+        from .models import ProductImage
+
+        return cls(ProductImage.objects.filter(product_id__in=set(product_ids)))
+
+    @classmethod
+    async def afor_products(cls, product_ids):
+        from .models import ProductImage
+
+        images = ProductImage.objects.filter(product_id__in=set(product_ids))
+        return cls([image async for image in images])
+
+    def get_images(self, variant):
+        """Images tagged with one of the variant's attribute values, else all."""
+        images = self.images.get(variant.product_id, [])
+        attr_ids = {attr.id for attr in variant.attributes.all()}
+        specific = [image for image in images if image.attribute_value_id in attr_ids]
+        return specific or images
+
+    def get_image(self, variant):
+        images = self.get_images(variant)
+        return images[0] if images else None
@@ -0,0 +1,469 @@
+import json
+from collections import Counter, defaultdict
+from decimal import Decimal, InvalidOperation
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import (
+    Attribute,
+    AttributeValue,
+    Brand,
+    Category,
+    Product,
+    ProductImage,
+    ProductSummary,
+    ProductVariant,
+)
+from .page_cache import invalidate_product_pages
+from .search import update_search_vectors
+from .tasks import generate_image_renditions
+from .taxonomy import bump_taxonomy_version
+from .variant_index import invalidate_variant_index
+
+REQUIRED = ("sku", "product", "name", "category", "brand", "price")
+TRUE_VALUES = {"1", "true", "yes", "y"}
+FALSE_VALUES = {"0", "false", "no", "n"}
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ImportRowError(f"invalid boolean {value!r}")
+
+
+def _parse_attributes(value):
+    # CSV: "color=Red|switch=Brown", JSONL: {"color": "Red", ...}
+    if isinstance(value, dict):
+        pairs = value.items()
+    else:
+        pairs = []
+        for part in str(value).split("|"):
+            if not part.strip():
+                continue
+            slug, sep, text = part.partition("=")
+            if not sep:
+                raise ImportRowError(f"invalid attribute {part!r}, expected slug=value")
+            pairs.append((slug, text))
+    return {str(slug).strip(): str(text).strip() for slug, text in pairs}
+
+
+def _parse_list(value):
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [item.strip() for item in str(value).split("|") if item.strip()]
+
+
+class CatalogImporter:
+    """Upserts catalog rows in chunks with bulk queries.
+
+    Each row describes one variant. Brands, categories and products are
+    matched by slug, variants by SKU and attribute values by attribute
+    and text; rows may leave out ``description``, ``specs``, ``available``,
+    ``attributes`` and ``images`` to keep what is stored. Images are only
+    added, never removed.
+
+    Bulk queries skip the model signals, so summaries, search vectors and
+    caches of the touched products are refreshed once per chunk instead.
+    """
+
+    def __init__(self, report=None, batch_size=1000):
+        self.report = report or (lambda line: None)
+        self.batch_size = batch_size
+        self.stats = defaultdict(Counter)
+        # products that lost a variant to another product in this chunk
+        self._moved_from = set()
+
+        self.brands = {}
+        self.categories = {}
+        self.attributes = {a.slug: a for a in Attribute.objects.all()}
+        self.values = {
+            (attribute_id, value): value_id
+            for value_id, attribute_id, value in AttributeValue.objects.values_list(
+                "id", "attribute_id", "value"
+            )
+        }
+        slugs = {a.id: slug for slug, a in self.attributes.items()}
+        self.value_labels = {
+            value_id: f"{slugs[attribute_id]}={value}"
+            for (attribute_id, value), value_id in self.values.items()
+        }
+        self.category_attributes = set(
+            Category.available_attributes.through.objects.values_list(
+                "category_id", "attribute_id"
+            )
+        )
+
+    def clean_row(self, raw):
+        """Validate one CSV or JSONL record, raising ImportRowError."""
+        for field in REQUIRED:
+            if _blank(raw.get(field)):
+                raise ImportRowError(f"missing {field}")
+
+        try:
+            price = Decimal(str(raw["price"]).strip())
+        except InvalidOperation:
+            raise ImportRowError(f"invalid price {raw['price']!r}")
+        if not price.is_finite() or price < 0 or price.as_tuple().exponent < -2:
+            raise ImportRowError(f"invalid price {raw['price']!r}")
+
+        row = {
+            "sku": str(raw["sku"]).strip(),
+            "product": slugify(raw["product"]),
+            "name": str(raw["name"]).strip(),
+            "category": str(raw["category"]).strip(),
+            "category_slug": slugify(raw.get("category_slug") or raw["category"]),
+            "brand": str(raw["brand"]).strip(),
+            "brand_slug": slugify(raw.get("brand_slug") or raw["brand"]),
+            "price": price,
+            "description": None,
+            "specs": None,
+            "available": None,
+            "attributes": None,
+            "images": None,
+        }
+        if not row["product"] or not row["category_slug"] or not row["brand_slug"]:
+            raise ImportRowError("product, category and brand need a usable slug")
+
+        if not _blank(raw.get("description")):
+            row["description"] = str(raw["description"])
+        if not _blank(raw.get("specs")):
+            specs = raw["specs"]
+            if isinstance(specs, str):
+                try:
+                    specs = json.loads(specs)
+                except ValueError:
+                    raise ImportRowError("specs is not valid JSON")
+            row["specs"] = specs
+        if not _blank(raw.get("available")):
+            row["available"] = _parse_bool(raw["available"])
+        if raw.get("attributes") is not None:
+            attributes = _parse_attributes(raw["attributes"])
+            unknown = set(attributes) - set(self.attributes)
+            if unknown:
+                raise ImportRowError(f"unknown attributes {', '.join(sorted(unknown))}")
+            row["attributes"] = attributes
+        if raw.get("images") is not None:
+            row["images"] = _parse_list(raw["images"])
+        return row
+
+    def import_chunk(self, rows):
+        """Write a chunk of cleaned rows; call inside a transaction."""
+        # a SKU repeated within the chunk keeps its last row
+        rows = list({row["sku"]: row for row in rows}.values())
+
+        touched = set()
+        touched |= self._upsert_named(
+            Brand, self.brands, "brand", {r["brand_slug"]: r["brand"] for r in rows}
+        )
+        touched |= self._upsert_named(
+            Category,
+            self.categories,
+            "category",
+            {r["category_slug"]: r["category"] for r in rows},
+        )
+        self._upsert_values(rows)
+
+        products, changed = self._upsert_products(rows)
+        touched |= changed
+        variants, changed_variants, created = self._upsert_variants(rows, products)
+        touched |= {variants[sku].product_id for sku in changed_variants}
+        touched |= self._sync_variant_attributes(rows, variants, created)
+        new_images = self._add_images(rows, products)
+        touched |= {image.product_id for image in new_images}
+
+        self._refresh(
+            touched,
+            [variants[sku].id for sku in changed_variants],
+            [image.id for image in new_images],
+        )
+
+    def _count(self, kind, outcome, key, changes=None):
+        self.stats[kind][outcome] += 1
+        if outcome == "created":
+            self.report(f"+ {kind} {key}")
+        elif outcome == "updated":
+            diff = ", ".join(
+                f"{field} {old} -> {new}" for field, (old, new) in changes.items()
+            )
+            self.report(f"~ {kind} {key}: {diff}")
+
+    def _apply(self, obj, values):
+        changes = {}
+        for field, value in values.items():
+            old = getattr(obj, field)
+            if old != value:
+                changes[field] = (old, value)
+                setattr(obj, field, value)
+        return changes
+
+    def _labels(self, value_ids):
+        return sorted(self.value_labels.get(i, str(i)) for i in value_ids)
+
+    def _upsert_named(self, model, known, kind, wanted):
+        """Brands and categories by slug; returns products needing a refresh.
+
+        Slugs cached from earlier chunks are compared too, so a later row
+        renaming one is applied and reported like any other update.
+        """
+        missing = {slug for slug in wanted if slug not in known}
+        existing = {}
+        if missing:
+            existing = {
+                obj.slug: obj for obj in model.objects.filter(slug__in=missing)
+            }
+        create, update = [], []
+        for slug, name in wanted.items():
+            obj = known.get(slug) or existing.get(slug)
+            if obj is None:
+                obj = model(slug=slug, name=name)
+                create.append(obj)
+                self._count(kind, "created", slug)
+            else:
+                changes = self._apply(obj, {"name": name})
+                if changes:
+                    update.append(obj)
+                    self._count(kind, "updated", slug, changes)
+                elif slug in missing:
+                    self._count(kind, "unchanged", slug)
+            known[slug] = obj
+
+        model.objects.bulk_create(create, batch_size=self.batch_size)
+        model.objects.bulk_update(update, ["name"], batch_size=self.batch_size)
+        if create or update:
+            transaction.on_commit(bump_taxonomy_version)
+
+        if not update:
+            return set()
+        # the brand and category names are part of the search vectors
+        # and product pages of everything in them
+        products = Product.objects.filter(**{f"{kind}__in": update})
+        return set(products.values_list("id", flat=True))
+
+    def _upsert_values(self, rows):
+        create = {}
+        links = set()
+        for row in rows:
+            if not row["attributes"]:
+                continue
+            category = self.categories[row["category_slug"]]
+            for slug, text in row["attributes"].items():
+                attribute = self.attributes[slug]
+                key = (attribute.id, text)
+                if key not in self.values and key not in create:
+                    create[key] = AttributeValue(attribute=attribute, value=text)
+                    self._count("attribute value", "created", f"{slug}={text}")
+                link = (category.id, attribute.id)
+                if link not in self.category_attributes:
+                    links.add(link)
+
+        AttributeValue.objects.bulk_create(create.values(), batch_size=self.batch_size)
+        for key, value in create.items():
+            self.values[key] = value.id
+            self.value_labels[value.id] = f"{value.attribute.slug}={value.value}"
+
+        # facets are offered per category, so new pairs get linked
+        Through = Category.available_attributes.through
+        Through.objects.bulk_create(
+            [Through(category_id=c, attribute_id=a) for c, a in links],
+            batch_size=self.batch_size,
+        )
+        self.category_attributes |= links
+        if create or links:
+            transaction.on_commit(bump_taxonomy_version)
+
+    def _upsert_products(self, rows):
+        wanted = {row["product"]: row for row in rows}
+        existing = {
+            p.slug: p
+            for p in Product.objects.filter(slug__in=wanted).only(
+                "id", "slug", "name", "category_id", "brand_id", "description", "specs"
+            )
+        }
+
+        now = timezone.now()
+        create, update, fields, changed = [], [], {"updated"}, set()
+        for slug, row in wanted.items():
+            values = {
+                "name": row["name"],
+                "category_id": self.categories[row["category_slug"]].id,
+                "brand_id": self.brands[row["brand_slug"]].id,
+            }
+            if row["description"] is not None:
+                values["description"] = row["description"]
+            if row["specs"] is not None:
+                values["specs"] = row["specs"]
+
+            product = existing.get(slug)
+            if product is None:
+                product = Product(slug=slug, **values)
+                create.append(product)
+                self._count("product", "created", slug)
+            else:
+                changes = self._apply(product, values)
+                if changes:
+                    product.updated = now
+                    update.append(product)
+                    fields.update(changes)
+                    changed.add(product.id)
+                    self._count("product", "updated", slug, changes)
+                else:
+                    self._count("product", "unchanged", slug)
+            existing[slug] = product
+
+        Product.objects.bulk_create(create, batch_size=self.batch_size)
+        Product.objects.bulk_update(update, fields, batch_size=self.batch_size)
+        changed |= {product.id for product in create}
+        return existing, changed
+
+    def _upsert_variants(self, rows, products):
+        existing = {
+            v.sku: v
+            for v in ProductVariant.objects.filter(
+                sku__in=[row["sku"] for row in rows]
+            ).only("id", "sku", "product_id", "price", "available")
+        }
+
+        create, update, fields, changed = [], [], set(), []
+        for row in rows:
+            values = {"product_id": products[row["product"]].id, "price": row["price"]}
+            if row["available"] is not None:
+                values["available"] = row["available"]
+
+            variant = existing.get(row["sku"])
+            if variant is None:
+                variant = ProductVariant(sku=row["sku"], **values)
+                create.append(variant)
+                changed.append(row["sku"])
+                self._count("variant", "created", row["sku"])
+            else:
+                previous_product = variant.product_id
+                changes = self._apply(variant, values)
+                if changes:
+                    update.append(variant)
+                    fields.update(changes)
+                    changed.append(row["sku"])
+                    self._count("variant", "updated", row["sku"], changes)
+                    if "product_id" in changes:
+                        # the old product loses a variant
+                        self._moved_from.add(previous_product)
+                else:
+                    self._count("variant", "unchanged", row["sku"])
+            existing[row["sku"]] = variant
+
+        ProductVariant.objects.bulk_create(create, batch_size=self.batch_size)
+        if update:
+            ProductVariant.objects.bulk_update(
+                update, fields, batch_size=self.batch_size
+            )
+        return existing, changed, {variant.id for variant in create}
+
+    def _sync_variant_attributes(self, rows, variants, created):
+        Through = ProductVariant.attributes.through
+        wanted = {
+            variants[row["sku"]].id: {
+                self.values[(self.attributes[slug].id, text)]
+                for slug, text in row["attributes"].items()
+            }
+            for row in rows
+            if row["attributes"] is not None
+        }
+        if not wanted:
+            return set()
+
+        current = defaultdict(dict)
+        for link_id, variant_id, value_id in Through.objects.filter(
+            productvariant_id__in=wanted
+        ).values_list("id", "productvariant_id", "attributevalue_id"):
+            current[variant_id][value_id] = link_id
+
+        add, remove, changed = [], [], set()
+        by_id = {variant.id: variant for variant in variants.values()}
+        for variant_id, value_ids in wanted.items():
+            have = current[variant_id]
+            missing = value_ids - set(have)
+            extra = set(have) - value_ids
+            if not missing and not extra:
+                continue
+            add.extend(
+                Through(productvariant_id=variant_id, attributevalue_id=value_id)
+                for value_id in missing
+            )
+            remove.extend(have[value_id] for value_id in extra)
+            variant = by_id[variant_id]
+            changed.add(variant.product_id)
+            if variant_id not in created:
+                self._count(
+                    "variant attributes",
+                    "updated",
+                    variant.sku,
+                    {"values": (self._labels(have), self._labels(value_ids))},
+                )
+
+        Through.objects.filter(id__in=remove).delete()
+        Through.objects.bulk_create(add, batch_size=self.batch_size)
+        return changed
+
+    def _add_images(self, rows, products):
+        wanted = defaultdict(list)
+        for row in rows:
+            for name in row["images"] or ():
+                product_id = products[row["product"]].id
+                if name not in wanted[product_id]:
+                    wanted[product_id].append(name)
+        if not wanted:
+            return []
+
+        current = defaultdict(set)
+        for product_id, name in ProductImage.objects.filter(
+            product_id__in=wanted
+        ).values_list("product_id", "image"):
+            current[product_id].add(name)
+
+        create = []
+        slugs = {product.id: slug for slug, product in products.items()}
+        for product_id, names in wanted.items():
+            has_images = bool(current[product_id])
+            for name in names:
+                if name in current[product_id]:
+                    continue
+                create.append(
+                    ProductImage(
+                        product_id=product_id, image=name, is_main=not has_images
+                    )
+                )
+                has_images = True
+                self._count("image", "created", f"{slugs[product_id]} {name}")
+        return ProductImage.objects.bulk_create(create, batch_size=self.batch_size)
+
+    def _refresh(self, product_ids, variant_ids, image_ids):
+        product_ids = sorted(product_ids | self._moved_from)
+        self._moved_from = set()
+        if product_ids:
+            Product.touch(product_ids)
+            ProductSummary.rebuild(product_ids)
+            update_search_vectors(product_ids)
+            transaction.on_commit(partial(invalidate_variant_index, product_ids))
+            transaction.on_commit(partial(invalidate_product_pages, product_ids))
+        if variant_ids:
+            # imported here to keep catalog free of a module-level payment import
+            from payment.tasks import sync_stripe_prices
+
+            transaction.on_commit(partial(sync_stripe_prices.delay, variant_ids))
+        for image_id in image_ids:
+            transaction.on_commit(partial(generate_image_renditions.delay, image_id))
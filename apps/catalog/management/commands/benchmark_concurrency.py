@@ -0,0 +1,256 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from catalog.models import Product, ProductVariant
+from orders.models import Order
+
+from .benchmark_storefront import ORDER_FORM, percentile
+
+BENCH_EMAIL = "concurrency@storefront.invalid"
+
+ENDPOINTS = ["variant_htmx", "cart_detail", "cart_add", "payment_process"]
+
+
+class Shopper:
+    """One simulated customer with its own connection and cookies."""
+
+    def __init__(self, base_url, timeout):
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=1),
+        )
+
+    async def post(self, url, data):
+        return await self.client.post(
+            url,
+            data=data,
+            headers={"X-CSRFToken": self.client.cookies.get("csrftoken", "")},
+        )
+
+    async def prepare(self, variant):
+        # the product page sets the CSRF cookie, the POSTs create the session
+        for response in [
+            await self.client.get(variant.product.get_absolute_url()),
+            await self.post(
+                reverse("cart:cart_add", args=[variant.id]), {"quantity": 1}
+            ),
+            await self.post(
+                reverse("orders:order_create"), {**ORDER_FORM, "email": BENCH_EMAIL}
+            ),
+        ]:
+            if response.is_error:
+                raise CommandError(
+                    f"Setup request {response.request.url} answered "
+                    f"{response.status_code}."
+                )
+
+
+class Command(BaseCommand):
+    help = (
+        "Hold a growing number of concurrent connections against running "
+        "deployments (e.g. sync gunicorn and uvicorn workers) and report "
+        "throughput and latency of the variant, cart and payment endpoints. "
+        "The deployments must share this database and should point Stripe "
+        "at stripe-mock."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            action="append",
+            required=True,
+            metavar="NAME=URL",
+            help="Deployment to measure, e.g. sync=http://web:8000 (repeatable).",
+        )
+        parser.add_argument(
+            "--connections",
+            type=int,
+            action="append",
+            help="Concurrent connections per run (repeatable, default 10, 50, 200).",
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10, help="Seconds per run."
+        )
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            choices=ENDPOINTS,
+            help="Only run these endpoints (repeatable).",
+        )
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument(
+            "--max-p95-ms",
+            type=float,
+            default=1000,
+            help="A run counts towards the capacity while p95 stays below this "
+            "and under 1%% of requests fail.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--json",
+            dest="json_path",
+            help="Write the results as JSON to this file ('-' for stdout).",
+        )
+
+    def handle(self, *args, **options):
+        targets = {}
+        for target in options["target"]:
+            name, sep, url = target.partition("=")
+            if not sep or not url:
+                raise CommandError(f"--target {target!r} is not NAME=URL.")
+            targets[name] = url.rstrip("/")
+
+        rng = random.Random(options["seed"])
+        variants = list(
+            ProductVariant.objects.filter(
+                available=True, product__summary__available=True
+            )
+            .select_related("product")
+            .prefetch_related("attributes__attribute")
+            .order_by("id")[:200]
+        )
+        if not variants:
+            raise CommandError("No available products; run seed_catalog first.")
+        self.variants = rng.sample(variants, min(len(variants), 20))
+        self.rng = rng
+
+        results = {}
+        try:
+            for name, url in targets.items():
+                results[name] = asyncio.run(self.run_target(url, options))
+        finally:
+            Order.objects.filter(email=BENCH_EMAIL).delete()
+
+        report = {
+            "meta": {
+                "duration": options["duration"],
+                "max_p95_ms": options["max_p95_ms"],
+                "targets": targets,
+                "products": Product.objects.count(),
+            },
+            "targets": results,
+        }
+        json_path = options["json_path"]
+        if json_path == "-":
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(report, f, indent=2)
+        self.write_table(results)
+
+    async def run_target(self, url, options):
+        levels = sorted(options["connections"] or [10, 50, 200])
+        shoppers = [Shopper(url, options["timeout"]) for _ in range(levels[-1])]
+        try:
+            # a few at a time, so setup does not count against the target
+            setup = asyncio.Semaphore(10)
+
+            async def prepare(shopper):
+                async with setup:
+                    await shopper.prepare(self.rng.choice(self.variants))
+
+            # a failed setup cancels the other shoppers
+            try:
+                async with asyncio.TaskGroup() as group:
+                    for shopper in shoppers:
+                        group.create_task(prepare(shopper))
+            except* CommandError as errors:
+                raise errors.exceptions[0]
+            results = {}
+            for endpoint in options["endpoint"] or ENDPOINTS:
+                runs = {}
+                for level in levels:
+                    runs[level] = await self.run_level(
+                        shoppers[:level], endpoint, options["duration"]
+                    )
+                capacity = max(
+                    (
+                        level
+                        for level in levels
+                        if runs[level]["error_rate"] < 0.01
+                        and runs[level]["p95_ms"] is not None
+                        and runs[level]["p95_ms"] < options["max_p95_ms"]
+                    ),
+                    default=0,
+                )
+                results[endpoint] = {"runs": runs, "capacity": capacity}
+            return results
+        finally:
+            await asyncio.gather(*(shopper.client.aclose() for shopper in shoppers))
+
+    def request(self, shopper, endpoint):
+        """The request of ``endpoint`` for a shopper and its expected status."""
+        variant = self.rng.choice(self.variants)
+        if endpoint == "variant_htmx":
+            selection = {
+                value.attribute.slug: value.value for value in variant.attributes.all()
+            }
+            url = reverse("catalog:product_variant_htmx", args=[variant.product.slug])
+            headers = {"HX-Request": "true"}
+            return shopper.client.get(url, params=selection, headers=headers), 200
+        if endpoint == "cart_detail":
+            return shopper.client.get(reverse("cart:cart_detail")), 200
+        if endpoint == "cart_add":
+            url = reverse("cart:cart_add", args=[variant.id])
+            return shopper.post(url, {"quantity": 1, "override": "on"}), 302
+        return shopper.client.get(reverse("payment:process")), 302
+
+    async def run_level(self, shoppers, endpoint, duration):
+        timings, errors = [], 0
+        deadline = time.perf_counter() + duration
+
+        async def shop(shopper):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                request, expected = self.request(shopper, endpoint)
+                started = time.perf_counter()
+                try:
+                    response = await request
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if response.status_code == expected:
+                    timings.append((time.perf_counter() - started) * 1000)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(shop(shopper) for shopper in shoppers))
+        elapsed = time.perf_counter() - started
+
+        total = len(timings) + errors
+        return {
+            "requests_per_s": round(len(timings) / elapsed, 1),
+            "p50_ms": round(percentile(timings, 50), 2) if timings else None,
+            "p95_ms": round(percentile(timings, 95), 2) if timings else None,
+            "p99_ms": round(percentile(timings, 99), 2) if timings else None,
+            "mean_ms": round(statistics.fmean(timings), 2) if timings else None,
+            "error_rate": round(errors / total, 4) if total else 1.0,
+        }
+
+    def write_table(self, results):
+        columns = ["requests_per_s", "p50_ms", "p95_ms", "p99_ms", "error_rate"]
+        self.stdout.write(
+            f"{'target':<10}{'endpoint':<18}{'conns':>7}"
+            + "".join(f"{c:>16}" for c in columns)
+        )
+        for name, endpoints in results.items():
+            for endpoint, result in endpoints.items():
+                for level, row in result["runs"].items():
+                    self.stdout.write(
+                        f"{name:<10}{endpoint:<18}{level:>7}"
+                        + "".join(f"{str(row[c]):>16}" for c in columns)
+                    )
+                self.stdout.write(
+                    f"{name:<10}{endpoint:<18}capacity: {result['capacity']} "
+                    "connections"
+                )
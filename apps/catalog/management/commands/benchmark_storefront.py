@@ -0,0 +1,414 @@
+import hashlib
+import hmac
+import json
+import math
+import random
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack, contextmanager
+from itertools import count
+from types import SimpleNamespace
+from unittest import mock
+
+import redis
+import redis.asyncio
+import stripe
+from celery.app.task import Task
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import Product, ProductVariant
+from orders.models import Order
+
+BENCH_EMAIL = "benchmark@storefront.invalid"
+EVENT_PREFIX = "evt_bench_"
+
+ORDER_FORM = {
+    "first_name": "Bench",
+    "last_name": "Mark",
+    "email": BENCH_EMAIL,
+    "address": "1 Benchmark Street",
+    "postal_code": "00000",
+    "city": "Testville",
+}
+
+
+class Counters:
+    """Redis round trips and Celery tasks issued during a request."""
+
+    def __init__(self):
+        self.redis_calls = 0
+        self.tasks = 0
+
+    def reset(self):
+        self.redis_calls = 0
+        self.tasks = 0
+
+    @contextmanager
+    def installed(self):
+        counters = self
+        execute_command = redis.Redis.execute_command
+        pipeline_execute = redis.client.Pipeline.execute
+
+        def counted_command(self, *args, **kwargs):
+            counters.redis_calls += 1
+            return execute_command(self, *args, **kwargs)
+
+        def counted_pipeline(self, *args, **kwargs):
+            counters.redis_calls += 1
+            return pipeline_execute(self, *args, **kwargs)
+
+        async_command = redis.asyncio.Redis.execute_command
+        async_pipeline = redis.asyncio.client.Pipeline.execute
+
+        async def counted_async_command(self, *args, **kwargs):
+            counters.redis_calls += 1
+            return await async_command(self, *args, **kwargs)
+
+        async def counted_async_pipeline(self, *args, **kwargs):
+            counters.redis_calls += 1
+            return await async_pipeline(self, *args, **kwargs)
+
+        def queued_task(self, *args, **kwargs):
+            # stand-in for the broker: tasks are counted, never run
+            counters.tasks += 1
+            return None
+
+        with ExitStack() as stack:
+            stack.enter_context(
+                mock.patch.object(redis.Redis, "execute_command", counted_command)
+            )
+            stack.enter_context(
+                mock.patch.object(redis.client.Pipeline, "execute", counted_pipeline)
+            )
+            stack.enter_context(
+                mock.patch.object(
+                    redis.asyncio.Redis, "execute_command", counted_async_command
+                )
+            )
+            stack.enter_context(
+                mock.patch.object(
+                    redis.asyncio.client.Pipeline, "execute", counted_async_pipeline
+                )
+            )
+            stack.enter_context(mock.patch.object(Task, "apply_async", queued_task))
+            yield self
+
+
+@contextmanager
+def offline_stripe():
+    """Answer the Stripe calls the storefront makes without the network."""
+    ids = count(1)
+
+    def create(prefix):
+        def stand_in(*args, **kwargs):
+            n = next(ids)
+            return SimpleNamespace(
+                id=f"{prefix}_bench_{n}", url=f"https://checkout.stripe.invalid/{n}"
+            )
+
+        return stand_in
+
+    def create_async(prefix):
+        stand_in = create(prefix)
+
+        async def async_stand_in(*args, **kwargs):
+            return stand_in(*args, **kwargs)
+
+        return async_stand_in
+
+    with ExitStack() as stack:
+        for target, prefix in [
+            (stripe.checkout.Session, "cs"),
+            (stripe.Coupon, "coupon"),
+            (stripe.Product, "prod"),
+            (stripe.Price, "price"),
+        ]:
+            stack.enter_context(
+                mock.patch.object(target, "create", create(prefix))
+            )
+            stack.enter_context(
+                mock.patch.object(target, "create_async", create_async(prefix))
+            )
+        stack.enter_context(mock.patch.object(stripe.Product, "modify", create("prod")))
+        yield
+
+
+def sign_webhook(payload, secret):
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class Storefront:
+    """The benchmarked requests.
+
+    Each method does its setup untimed and returns the request to time
+    together with the expected status code.
+    """
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.events = count(1)
+
+        available = Product.objects.filter(summary__available=True)
+        total = available.count()
+        if not total:
+            raise CommandError("No available products; run seed_catalog first.")
+        self.products = [
+            available.select_related("category").order_by("id")[i]
+            for i in sorted(rng.sample(range(total), min(total, 20)))
+        ]
+        self.variants = list(
+            ProductVariant.objects.filter(
+                product__in=self.products, available=True
+            ).prefetch_related("attributes__attribute")
+        )
+
+        self.cart_client = Client()
+        for variant in self.variants[:3]:
+            self.add_to_cart(self.cart_client, variant)
+
+        self.order_client = Client()
+        self.add_to_cart(self.order_client, self.variants[0])
+        self.order_client.post(reverse("orders:order_create"), ORDER_FORM)
+
+    def add_to_cart(self, client, variant):
+        return client.post(
+            reverse("cart:cart_add", args=[variant.id]), {"quantity": 1}
+        )
+
+    def catalog_list(self):
+        client = Client()
+        return lambda: client.get(reverse("catalog:product_list")), 200
+
+    def catalog_category(self):
+        client = Client()
+        product = self.rng.choice(self.products)
+        url = reverse("catalog:product_list_by_category", args=[product.category.slug])
+        params = {"brand": product.brand_id, "o": "price"}
+        return lambda: client.get(url, params), 200
+
+    def product_detail(self):
+        client = Client()
+        url = self.rng.choice(self.products).get_absolute_url()
+        return lambda: client.get(url), 200
+
+    def variant_htmx(self):
+        client = Client()
+        variant = self.rng.choice(self.variants)
+        selection = {
+            value.attribute.slug: value.value for value in variant.attributes.all()
+        }
+        url = reverse("catalog:product_variant_htmx", args=[variant.product.slug])
+        return lambda: client.get(url, selection, HTTP_HX_REQUEST="true"), 200
+
+    def cart_detail(self):
+        return lambda: self.cart_client.get(reverse("cart:cart_detail")), 200
+
+    def cart_add(self):
+        client = Client()
+        variant = self.rng.choice(self.variants)
+        return lambda: self.add_to_cart(client, variant), 302
+
+    def order_create(self):
+        client = Client()
+        self.add_to_cart(client, self.rng.choice(self.variants))
+        return lambda: client.post(reverse("orders:order_create"), ORDER_FORM), 302
+
+    def payment_process(self):
+        return lambda: self.order_client.get(reverse("payment:process")), 302
+
+    def stripe_webhook(self):
+        client = Client()
+        order_id = self.order_client.session["order_id"]
+        payload = json.dumps(
+            {
+                "id": f"{EVENT_PREFIX}{next(self.events)}",
+                "object": "event",
+                "type": "checkout.session.completed",
+                "data": {
+                    "object": {
+                        "mode": "payment",
+                        "payment_status": "paid",
+                        "client_reference_id": str(order_id),
+                        "payment_intent": "pi_bench",
+                    }
+                },
+            }
+        )
+        signature = sign_webhook(payload, settings.STRIPE_WEBHOOK_SECRET)
+        return lambda: client.post(
+            reverse("payment:stripe-webhook"),
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=signature,
+        ), 200
+
+
+ENDPOINTS = [
+    "catalog_list",
+    "catalog_category",
+    "product_detail",
+    "variant_htmx",
+    "cart_detail",
+    "cart_add",
+    "order_create",
+    "payment_process",
+    "stripe_webhook",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency, SQL queries and Redis calls of the storefront "
+        "endpoints. Stripe, SMTP and the Celery broker are replaced by local "
+        "stand-ins, so only the database and Redis are needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=5,
+            help="Untimed requests per endpoint to fill caches first.",
+        )
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            choices=ENDPOINTS,
+            help="Only run these endpoints (repeatable).",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--json",
+            dest="json_path",
+            help="Write the results as JSON to this file ('-' for stdout).",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+
+        counters = Counters()
+        started = timezone.now()
+        with ExitStack() as stack:
+            stack.enter_context(
+                override_settings(
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+                )
+            )
+            stack.enter_context(offline_stripe())
+            stack.enter_context(counters.installed())
+
+            try:
+                storefront = Storefront(random.Random(options["seed"]))
+                results = {
+                    name: self.run_endpoint(storefront, name, counters, options)
+                    for name in options["endpoint"] or ENDPOINTS
+                }
+            finally:
+                self.cleanup()
+
+        report = {
+            "meta": {
+                "started": started.isoformat(),
+                "commit": _git_commit(),
+                "database": connection.vendor,
+                "iterations": options["iterations"],
+                "warmup": options["warmup"],
+                "seed": options["seed"],
+                "dataset": {
+                    "products": Product.objects.count(),
+                    "variants": ProductVariant.objects.count(),
+                    "orders": Order.objects.count(),
+                },
+            },
+            "endpoints": results,
+        }
+
+        json_path = options["json_path"]
+        if json_path == "-":
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(report, f, indent=2)
+        self.write_table(results)
+
+    def run_endpoint(self, storefront, name, counters, options):
+        prepare = getattr(storefront, name)
+
+        for _ in range(options["warmup"]):
+            request, _ = prepare()
+            request()
+
+        timings, queries, redis_calls, tasks = [], [], [], []
+        for _ in range(options["iterations"]):
+            request, expected = prepare()
+            counters.reset()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request()
+                elapsed = time.perf_counter() - started
+
+            if response.status_code != expected:
+                raise CommandError(
+                    f"{name} answered {response.status_code}, expected {expected}."
+                )
+            timings.append(elapsed * 1000)
+            queries.append(len(captured))
+            redis_calls.append(counters.redis_calls)
+            tasks.append(counters.tasks)
+
+        return {
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "mean_ms": round(statistics.fmean(timings), 2),
+            "queries": statistics.median_low(queries),
+            "queries_max": max(queries),
+            "redis_calls": statistics.median_low(redis_calls),
+            "tasks": statistics.median_low(tasks),
+        }
+
+    def write_table(self, results):
+        columns = ["p50_ms", "p95_ms", "queries", "redis_calls", "tasks"]
+        self.stdout.write(f"{'endpoint':<18}" + "".join(f"{c:>13}" for c in columns))
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<18}" + "".join(f"{row[c]:>13}" for c in columns)
+            )
+
+    def cleanup(self):
+        from payment.models import StripeEvent
+
+        Order.objects.filter(email=BENCH_EMAIL).delete()
+        StripeEvent.objects.filter(event_id__startswith=EVENT_PREFIX).delete()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from catalog.feeds import FEEDS, build_feed
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the gzip-compressed CSV and XML product feeds, re-rendering "
+        "only products updated since the last build."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            action="append",
+            choices=sorted(FEEDS),
+            help="Only build this feed (repeatable).",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Render every item instead of reusing the last build.",
+        )
+
+    def handle(self, *args, **options):
+        for fmt in options["format"] or sorted(FEEDS):
+            stats = build_feed(fmt, full=options["full"])
+            mode = "incremental" if stats["incremental"] else "full"
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Built {stats['name']} ({mode}): {stats['rendered']} rendered, "
+                    f"{stats['reused']} reused"
+                )
+            )
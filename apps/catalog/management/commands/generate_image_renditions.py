@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from catalog.models import ProductImage
+from catalog.tasks import generate_image_renditions
+
+
+def _generate(image_id, force):
+    try:
+        generate_image_renditions(image_id, force=force)
+    finally:
+        # every worker thread opens its own connection
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Generate resized renditions for existing product images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of images processed in parallel.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate renditions that are already up to date.",
+        )
+        parser.add_argument(
+            "--queue",
+            action="store_true",
+            help="Queue Celery tasks instead of rendering in this process.",
+        )
+
+    def handle(self, *args, **options):
+        force = options["force"]
+        images = ProductImage.objects.exclude(image="").order_by("id")
+        ids = list(images.values_list("id", flat=True))
+
+        if options["queue"]:
+            for image_id in ids:
+                generate_image_renditions.delay(image_id, force=force)
+            self.stdout.write(self.style.SUCCESS(f"Queued {len(ids)} images"))
+            return
+
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = {
+                executor.submit(_generate, image_id, force): image_id
+                for image_id in ids
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"Image {futures[future]}: {e}")
+                else:
+                    done += 1
+                if (done + failed) % 100 == 0:
+                    self.stdout.write(f"Processed {done + failed}/{len(ids)} images")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Processed {done} images, {failed} failed")
+        )
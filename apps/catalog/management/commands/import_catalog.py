@@ -0,0 +1,128 @@
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from catalog.importer import CatalogImporter, ImportRowError
+
+
+def read_csv(f):
+    reader = csv.DictReader(f)
+    # line 1 is the header
+    for line, record in enumerate(reader, start=2):
+        yield line, record
+
+
+def read_jsonl(f):
+    for line, text in enumerate(f, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError:
+            record = ImportRowError("invalid JSON")
+        if not isinstance(record, (dict, ImportRowError)):
+            record = ImportRowError("not a JSON object")
+        yield line, record
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert brands, categories, products, variants and attribute values "
+        "from a CSV or JSONL file with one variant per row."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file, or '-' for stdin.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="Input format; guessed from the file extension by default.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Rows read, written and committed together.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print what would change and roll everything back.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"]
+        if fmt is None:
+            if path.endswith(".csv"):
+                fmt = "csv"
+            elif path.endswith((".jsonl", ".ndjson")):
+                fmt = "jsonl"
+            else:
+                raise CommandError("Cannot guess the input format; pass --format.")
+
+        if path == "-":
+            self.run(sys.stdin, fmt, options)
+        else:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                self.run(f, fmt, options)
+
+    def run(self, f, fmt, options):
+        dry_run = options["dry_run"]
+        verbose = dry_run or options["verbosity"] >= 2
+        importer = CatalogImporter(
+            report=self.stdout.write if verbose else None,
+            batch_size=options["chunk_size"],
+        )
+        records = read_csv(f) if fmt == "csv" else read_jsonl(f)
+
+        self.rows = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        if dry_run:
+            with transaction.atomic():
+                self.import_records(importer, records, options["chunk_size"], verbose)
+                transaction.set_rollback(True)
+        else:
+            self.import_records(importer, records, options["chunk_size"], verbose)
+
+        for kind, counts in importer.stats.items():
+            summary = ", ".join(
+                f"{n} {outcome}" for outcome, n in sorted(counts.items())
+            )
+            self.stdout.write(f"{kind}: {summary}")
+        message = (
+            f"{'Checked' if dry_run else 'Imported'} {self.rows} rows "
+            f"({self.rate():.0f} rows/s), {self.errors} rejected"
+        )
+        if dry_run:
+            message += "; dry run, nothing was saved"
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def import_records(self, importer, records, chunk_size, verbose):
+        while batch := list(islice(records, chunk_size)):
+            chunk = []
+            for line, record in batch:
+                try:
+                    if isinstance(record, ImportRowError):
+                        raise record
+                    chunk.append(importer.clean_row(record))
+                except ImportRowError as e:
+                    self.errors += 1
+                    self.stderr.write(f"line {line}: {e}")
+            if not chunk:
+                continue
+
+            with transaction.atomic():
+                importer.import_chunk(chunk)
+            self.rows += len(chunk)
+            if not verbose:
+                self.stdout.write(f"{self.rows} rows ({self.rate():.0f} rows/s)")
+
+    def rate(self):
+        return self.rows / max(time.monotonic() - self.started, 1e-6)
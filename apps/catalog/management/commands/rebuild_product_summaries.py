@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from catalog.models import Product, ProductSummary
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized product listing summaries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        ids = Product.objects.order_by("id").values_list("id", flat=True)
+
+        chunk = []
+        total = 0
+        for product_id in ids.iterator(chunk_size=chunk_size):
+            chunk.append(product_id)
+            if len(chunk) == chunk_size:
+                ProductSummary.rebuild(chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            ProductSummary.rebuild(chunk)
+            total += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} product summaries"))
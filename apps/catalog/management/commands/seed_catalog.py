@@ -0,0 +1,285 @@
+import random
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from catalog.models import (
+    Attribute,
+    AttributeValue,
+    Brand,
+    Category,
+    Product,
+    ProductImage,
+    ProductVariant,
+)
+from catalog.taxonomy import bump_taxonomy_version
+from orders.models import Order, OrderItem
+
+PREFIX = "seed"
+ORDER_EMAIL_DOMAIN = "seed.invalid"
+
+COLORS = ["Black", "White", "Grey", "Red", "Blue", "Green", "Beige", "Navy"]
+LAYOUTS = ["60%", "65%", "75%", "TKL", "Full size"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a generated catalog and order history for "
+        "load testing. Output is deterministic for a given --seed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1000)
+        parser.add_argument("--variants-per-product", type=int, default=4)
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--brands", type=int, default=50)
+        parser.add_argument("--attributes", type=int, default=6)
+        parser.add_argument(
+            "--values-per-attribute", type=int, default=len(COLORS)
+        )
+        parser.add_argument(
+            "--attributes-per-category",
+            type=int,
+            default=3,
+            help="Attributes each category offers as facets.",
+        )
+        parser.add_argument("--images-per-product", type=int, default=2)
+        parser.add_argument("--orders", type=int, default=1000)
+        parser.add_argument(
+            "--paid-ratio",
+            type=float,
+            default=0.8,
+            help="Share of generated orders that are marked paid.",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--recommendations",
+            action="store_true",
+            help="Replay the paid orders into the Redis recommendations.",
+        )
+
+    def handle(self, *args, **options):
+        if Product.objects.filter(slug__startswith=f"{PREFIX}-").exists():
+            raise CommandError(
+                "The database already holds a seeded catalog; "
+                "run it against an empty database (manage.py flush)."
+            )
+        if options["attributes_per_category"] > options["attributes"]:
+            raise CommandError("--attributes-per-category exceeds --attributes.")
+
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+
+        with transaction.atomic():
+            categories = self.create_taxonomy(options)
+        self.create_products(categories, options)
+        self.create_orders(options)
+
+        # bulk_create skips the signals that normally keep these in sync
+        call_command("rebuild_product_summaries", stdout=self.stdout)
+        call_command("update_search_vectors", stdout=self.stdout)
+        if options["recommendations"]:
+            call_command("backfill_recommendations", stdout=self.stdout)
+        bump_taxonomy_version()
+
+        self.stdout.write(self.style.SUCCESS("Seeded catalog"))
+
+    def create_taxonomy(self, options):
+        rng = self.rng
+
+        attributes = Attribute.objects.bulk_create(
+            Attribute(name=f"Attribute {i}", slug=f"{PREFIX}-attr-{i}")
+            for i in range(options["attributes"])
+        )
+        values = []
+        for attribute in attributes:
+            for i in range(options["values_per_attribute"]):
+                value = COLORS[i] if i < len(COLORS) else f"Value {i}"
+                values.append(AttributeValue(attribute=attribute, value=value))
+        values = AttributeValue.objects.bulk_create(values)
+
+        self.values_by_attribute = {}
+        for value in values:
+            self.values_by_attribute.setdefault(value.attribute_id, []).append(
+                value.id
+            )
+
+        Brand.objects.bulk_create(
+            Brand(name=f"Brand {i}", slug=f"{PREFIX}-brand-{i}")
+            for i in range(options["brands"])
+        )
+        self.brand_ids = list(
+            Brand.objects.filter(slug__startswith=f"{PREFIX}-").values_list(
+                "id", flat=True
+            )
+        )
+
+        Category.objects.bulk_create(
+            Category(name=f"Category {i}", slug=f"{PREFIX}-category-{i}")
+            for i in range(options["categories"])
+        )
+        categories = list(
+            Category.objects.filter(slug__startswith=f"{PREFIX}-").order_by("id")
+        )
+
+        links = []
+        self.attributes_by_category = {}
+        for category in categories:
+            chosen = rng.sample(attributes, options["attributes_per_category"])
+            self.attributes_by_category[category.id] = [a.id for a in chosen]
+            links.extend(
+                Category.available_attributes.through(
+                    category_id=category.id, attribute_id=a.id
+                )
+                for a in chosen
+            )
+        Category.available_attributes.through.objects.bulk_create(links)
+
+        self.stdout.write(
+            f"Created {len(categories)} categories, {len(self.brand_ids)} brands, "
+            f"{len(attributes)} attributes and {len(values)} values"
+        )
+        return categories
+
+    def create_products(self, categories, options):
+        total = options["products"]
+        created = 0
+        for start in range(0, total, self.batch_size):
+            stop = min(start + self.batch_size, total)
+            with transaction.atomic():
+                self.create_product_batch(range(start, stop), categories, options)
+            created = stop
+            self.stdout.write(f"Created {created} products")
+
+    def create_product_batch(self, indexes, categories, options):
+        rng = self.rng
+        products = Product.objects.bulk_create(
+            Product(
+                name=f"Product {i}",
+                slug=f"{PREFIX}-{i}",
+                category=rng.choice(categories),
+                brand_id=rng.choice(self.brand_ids),
+                description=f"Generated product {i} for load testing.",
+                specs={"layout": rng.choice(LAYOUTS), "weight": rng.randint(400, 1800)},
+            )
+            for i in indexes
+        )
+
+        variants = []
+        combinations = []
+        first_combination = {}
+        for i, product in zip(indexes, products):
+            value_lists = [
+                self.values_by_attribute[attribute_id]
+                for attribute_id in self.attributes_by_category[product.category_id]
+            ]
+            base_price = Decimal(rng.randint(2000, 40000)) / 100
+            for j in range(options["variants_per_product"]):
+                variants.append(
+                    ProductVariant(
+                        product=product,
+                        price=base_price + j * 5,
+                        sku=f"{PREFIX.upper()}-{i}-{j}",
+                        available=rng.random() > 0.05,
+                    )
+                )
+                combinations.append(_combination(value_lists, j))
+            first_combination[product.id] = _combination(value_lists, 0)
+        variants = ProductVariant.objects.bulk_create(variants)
+
+        Through = ProductVariant.attributes.through
+        Through.objects.bulk_create(
+            (
+                Through(productvariant_id=variant.id, attributevalue_id=value_id)
+                for variant, value_ids in zip(variants, combinations)
+                for value_id in value_ids
+            ),
+            batch_size=self.batch_size,
+        )
+
+        # Only the rows; the image files and renditions are not generated.
+        images = []
+        for product in products:
+            value_ids = first_combination[product.id]
+            for k in range(options["images_per_product"]):
+                images.append(
+                    ProductImage(
+                        product=product,
+                        image=f"products/{PREFIX}/{product.slug}-{k}.jpg",
+                        is_main=k == 0,
+                        attribute_value_id=(
+                            rng.choice(value_ids) if k and value_ids else None
+                        ),
+                    )
+                )
+        ProductImage.objects.bulk_create(images)
+
+    def create_orders(self, options):
+        rng = self.rng
+        variant_ids = list(
+            ProductVariant.objects.filter(sku__startswith=f"{PREFIX.upper()}-")
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        if not variant_ids:
+            return
+
+        total = options["orders"]
+        for start in range(0, total, self.batch_size):
+            stop = min(start + self.batch_size, total)
+            with transaction.atomic():
+                picks = [
+                    rng.sample(variant_ids, min(rng.randint(1, 4), len(variant_ids)))
+                    for _ in range(start, stop)
+                ]
+                prices = dict(
+                    ProductVariant.objects.filter(
+                        id__in={i for pick in picks for i in pick}
+                    ).values_list("id", "price")
+                )
+
+                orders = []
+                items = []
+                for i, pick in zip(range(start, stop), picks):
+                    order = Order(
+                        first_name="Load",
+                        last_name=f"Test {i}",
+                        email=f"order-{i}@{ORDER_EMAIL_DOMAIN}",
+                        address=f"{i} Benchmark Street",
+                        postal_code="00000",
+                        city="Testville",
+                        paid=rng.random() < options["paid_ratio"],
+                    )
+                    order_items = [
+                        OrderItem(
+                            order=order,
+                            variant_id=variant_id,
+                            price=prices[variant_id],
+                            quantity=rng.randint(1, 3),
+                        )
+                        for variant_id in pick
+                    ]
+                    # bulk_create skips Order.save, so set the totals here
+                    order.set_totals(
+                        sum(item.price * item.quantity for item in order_items)
+                    )
+                    orders.append(order)
+                    items.extend(order_items)
+
+                Order.objects.bulk_create(orders)
+                for item in items:
+                    item.order_id = item.order.id
+                OrderItem.objects.bulk_create(items)
+            self.stdout.write(f"Created {stop} orders")
+
+
+def _combination(value_lists, n):
+    """The n-th attribute value combination, so variants of a product differ."""
+    combination = []
+    for values in value_lists:
+        n, index = divmod(n, len(values))
+        combination.append(values[index])
+    return combination
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from catalog.models import Product
+from catalog.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search vectors of all products."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        ids = Product.objects.order_by("id").values_list("id", flat=True)
+
+        chunk = []
+        total = 0
+        for product_id in ids.iterator(chunk_size=chunk_size):
+            chunk.append(product_id)
+            if len(chunk) == chunk_size:
+                update_search_vectors(chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            update_search_vectors(chunk)
+            total += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {total} search vectors"))
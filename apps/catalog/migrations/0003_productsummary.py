@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0002_remove_keycapspecification_product_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="productimage",
+            options={"ordering": ["-is_main", "id"]},
+        ),
+        migrations.CreateModel(
+            name="ProductSummary",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="catalog.product",
+                    ),
+                ),
+                (
+                    "min_price",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                (
+                    "max_price",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                ("available", models.BooleanField(default=False)),
+                ("orders_count", models.PositiveIntegerField(default=0)),
+                ("main_image_url", models.CharField(blank=True, max_length=500)),
+            ],
+            options={
+                "verbose_name_plural": "Product summaries",
+                "indexes": [
+                    models.Index(
+                        fields=["min_price"], name="catalog_pro_min_pri_d873b0_idx"
+                    ),
+                    models.Index(
+                        fields=["-orders_count"], name="catalog_pro_orders__c8f935_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+from django.db import migrations
+from django.db.models import Count, Max, Min, Q
+
+CHUNK_SIZE = 500
+
+
+def fill_product_summaries(apps, schema_editor):
+    """Create the missing listing summaries of existing products.
+
+    Mirrors ProductSummary.rebuild with the historical models, so the
+    listings show prices and images right after the deploy.
+    """
+    Product = apps.get_model("catalog", "Product")
+    ProductImage = apps.get_model("catalog", "ProductImage")
+    ProductSummary = apps.get_model("catalog", "ProductSummary")
+    ProductVariant = apps.get_model("catalog", "ProductVariant")
+
+    missing = list(
+        Product.objects.filter(summary__isnull=True)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    in_stock = Q(available=True) & (Q(stock__isnull=True) | Q(stock__gt=0))
+    for start in range(0, len(missing), CHUNK_SIZE):
+        product_ids = missing[start : start + CHUNK_SIZE]
+        summaries = {pid: ProductSummary(product_id=pid) for pid in product_ids}
+
+        prices = (
+            ProductVariant.objects.filter(product_id__in=product_ids)
+            .values("product_id")
+            .annotate(
+                min_price=Min("price"),
+                max_price=Max("price"),
+                available_count=Count("id", filter=in_stock),
+            )
+            .order_by()
+        )
+        for row in prices:
+            summary = summaries[row["product_id"]]
+            summary.min_price = row["min_price"]
+            summary.max_price = row["max_price"]
+            summary.available = bool(row["available_count"])
+
+        orders = (
+            Product.objects.filter(
+                id__in=product_ids, variants__order_items__order__paid=True
+            )
+            .values("id")
+            .annotate(orders_count=Count("variants__order_items__order", distinct=True))
+            .order_by()
+        )
+        for row in orders:
+            summaries[row["id"]].orders_count = row["orders_count"]
+
+        images = ProductImage.objects.filter(product_id__in=product_ids).order_by(
+            "-is_main", "id"
+        )
+        seen = set()
+        for image in images:
+            if image.product_id in seen:
+                continue
+            seen.add(image.product_id)
+            if image.image:
+                summary = summaries[image.product_id]
+                summary.main_image_url = image.image.url
+                if image.renditions.get("source") == image.image.name:
+                    summary.main_image_renditions = image.renditions
+
+        ProductSummary.objects.bulk_create(summaries.values(), ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0006_variant_stock"),
+        ("orders", "0006_order_reserved_until"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_product_summaries, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,16 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Count, F, Max, Min, Q
+from django.dispatch import Signal
 from django.urls import reverse
+from django.utils import timezone
+
+from .images import ImageResolver
+
+# Sent with ``product_ids`` when variants sell out or come back in stock.
+# Stock moves by conditional UPDATEs, which skip post_save.
+stock_availability_changed = Signal()
 
 
 class Attribute(models.Model):
@@ -53,25 +64,26 @@ class Product(models.Model):
     brand = models.ForeignKey(Brand, related_name="products", on_delete=models.CASCADE)
     description = models.TextField(blank=True)
     specs = models.JSONField(default=dict, blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
     def get_absolute_url(self):
         return reverse("catalog:product_detail", args=[self.slug])
 
-    def get_main_image_url(self):
-        if hasattr(self, "main_img_list"):
-            if self.main_img_list:
-                return self.main_img_list[0].image.url
+    @classmethod
+    def touch(cls, product_ids):
+        """Bump ``updated`` for changes stored outside the product row.
 
-        else:
-            img = self.images.filter(is_main=True).first()
-            if not img:
-                img = self.images.first()
-
-            if img:
-                return img.image.url
+        Incremental feed builds rely on it to find changed products.
+        """
+        cls.objects.filter(id__in=product_ids).update(updated=timezone.now())
 
+    def get_main_image_url(self):
+        # uses prefetched images when available, one query otherwise
+        image = next(iter(self.images.all()), None)
+        if image and image.image:
+            return image.image.url
         return None
 
     class Meta:
@@ -79,12 +91,20 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=["id", "slug"]),
             models.Index(fields=["name"]),
+            GinIndex(fields=["search_vector"], name="product_search_vector_idx"),
+            GinIndex(
+                fields=["name"], name="product_name_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
         ]
 
     def __str__(self):
         return self.name
 
 
+# variants that can be sold right now
+IN_STOCK = Q(available=True) & (Q(stock__isnull=True) | Q(stock__gt=0))
+
+
 class ProductVariant(models.Model):
     product = models.ForeignKey(
         Product, related_name="variants", on_delete=models.CASCADE
@@ -96,27 +116,62 @@ class ProductVariant(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     sku = models.CharField(max_length=255, unique=True)
     available = models.BooleanField(default=True)
+    # units left to sell; empty means stock is not tracked for the variant
+    stock = models.PositiveIntegerField(null=True, blank=True)
+
+    @classmethod
+    def take_stock(cls, quantities):
+        """Decrement stock for ``{variant_id: quantity}``.
+
+        Each decrement is one conditional UPDATE, so concurrent buyers never
+        read-modify-write the count. Returns False when a variant is short;
+        the caller has to roll back the decrements already made.
+        """
+        for variant_id, quantity in sorted(quantities.items()):
+            taken = cls.objects.filter(id=variant_id, stock__gte=quantity).update(
+                stock=F("stock") - quantity
+            )
+            if not taken and cls.objects.filter(
+                id=variant_id, stock__isnull=False
+            ).exists():
+                return False
+        # nothing can be taken from an empty variant, so these just sold out
+        sold_out = cls._sold_out_products(quantities)
+        if sold_out:
+            stock_availability_changed.send(sender=cls, product_ids=sold_out)
+        return True
+
+    @classmethod
+    def return_stock(cls, quantities):
+        restocked = cls._sold_out_products(quantities)
+        for variant_id, quantity in sorted(quantities.items()):
+            cls.objects.filter(id=variant_id, stock__isnull=False).update(
+                stock=F("stock") + quantity
+            )
+        if restocked:
+            stock_availability_changed.send(sender=cls, product_ids=restocked)
+
+    @classmethod
+    def _sold_out_products(cls, variant_ids):
+        return set(
+            cls.objects.filter(id__in=variant_ids, stock=0).values_list(
+                "product_id", flat=True
+            )
+        )
+
+    @property
+    def in_stock(self):
+        """Whether the variant can be sold, see ``IN_STOCK``."""
+        return self.available and (self.stock is None or self.stock > 0)
 
     def get_image_url(self):
-        attr_ids = self.attributes.values_list("id", flat=True)
-
-        specific_image = self.product.images.filter(
-            attribute_value__id__in=attr_ids
-        ).first()
-
-        if specific_image:
-            return specific_image.image.url
-
-        return self.product.get_main_image_url()
+        image = ImageResolver(self.product.images.all()).get_image(self)
+        if image and image.image:
+            return image.image.url
+        return None
 
     def get_images(self):
-        attr_ids = self.attributes.values_list("id", flat=True)
-        images = self.product.images.filter(attribute_value__id__in=attr_ids)
-
-        if images.exists():
-            return images
-
-        return self.product.images.all()
+        return ImageResolver(self.product.images.all()).get_images(self)
 
     def __str__(self):
         return f"{self.product.name} (SKU: {self.sku})"
@@ -135,9 +190,145 @@ class ProductImage(models.Model):
     )
     image = models.ImageField(upload_to="products/%Y/%m/%d/", blank=True)
     is_main = models.BooleanField(default=False)
+    # filled in by catalog.tasks.generate_image_renditions
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f"Img for {self.product.name}"
 
+    def get_renditions(self):
+        """Renditions of the current upload, empty until they are generated."""
+        if self.image and self.renditions.get("source") == self.image.name:
+            return self.renditions
+        return {}
+
     class Meta:
         ordering = ["-is_main", "id"]
+
+
+class ProductSummary(models.Model):
+    """Denormalized listing data, kept in sync by catalog.signals."""
+
+    product = models.OneToOneField(
+        Product, related_name="summary", on_delete=models.CASCADE, primary_key=True
+    )
+    min_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
+    max_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
+    available = models.BooleanField(default=False)
+    orders_count = models.PositiveIntegerField(default=0)
+    main_image_url = models.CharField(max_length=500, blank=True)
+    main_image_renditions = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Product summaries"
+        indexes = [
+            models.Index(fields=["min_price"]),
+            models.Index(fields=["-orders_count"]),
+        ]
+
+    def __str__(self):
+        return f"Summary for {self.product_id}"
+
+    @classmethod
+    def _store(cls, product_id, values, create=True):
+        # On cascade deletes the summary row may already be gone, so only
+        # upsert when the change comes from a save.
+        if create:
+            cls.objects.bulk_create(
+                [cls(product_id=product_id, **values)],
+                update_conflicts=True,
+                unique_fields=["product"],
+                update_fields=list(values),
+            )
+        else:
+            cls.objects.filter(product_id=product_id).update(**values)
+
+    @classmethod
+    def refresh_prices(cls, product_id, create=True):
+        stats = ProductVariant.objects.filter(product_id=product_id).aggregate(
+            min_price=Min("price"),
+            max_price=Max("price"),
+            available_count=Count("id", filter=IN_STOCK),
+        )
+        values = {
+            "min_price": stats["min_price"],
+            "max_price": stats["max_price"],
+            "available": bool(stats["available_count"]),
+        }
+        cls._store(product_id, values, create=create)
+
+    @classmethod
+    def refresh_image(cls, product_id, create=True):
+        image = ProductImage.objects.filter(product_id=product_id).first()
+        values = {"main_image_url": "", "main_image_renditions": {}}
+        if image and image.image:
+            values["main_image_url"] = image.image.url
+            values["main_image_renditions"] = image.get_renditions()
+        cls._store(product_id, values, create=create)
+
+    @classmethod
+    def increment_orders(cls, product_ids):
+        cls.objects.filter(product_id__in=product_ids).update(
+            orders_count=F("orders_count") + 1
+        )
+
+    @classmethod
+    def rebuild(cls, product_ids):
+        product_ids = list(product_ids)
+        summaries = {pid: cls(product_id=pid) for pid in product_ids}
+
+        prices = (
+            ProductVariant.objects.filter(product_id__in=product_ids)
+            .values("product_id")
+            .annotate(
+                min_price=Min("price"),
+                max_price=Max("price"),
+                available_count=Count("id", filter=IN_STOCK),
+            )
+        )
+        for row in prices:
+            summary = summaries[row["product_id"]]
+            summary.min_price = row["min_price"]
+            summary.max_price = row["max_price"]
+            summary.available = bool(row["available_count"])
+
+        orders = (
+            Product.objects.filter(
+                id__in=product_ids, variants__order_items__order__paid=True
+            )
+            .values("id")
+            .annotate(
+                orders_count=Count("variants__order_items__order", distinct=True)
+            )
+        )
+        for row in orders:
+            summaries[row["id"]].orders_count = row["orders_count"]
+
+        # Images come back main-first, so the first one seen per product wins.
+        seen = set()
+        for image in ProductImage.objects.filter(product_id__in=product_ids):
+            if image.product_id in seen:
+                continue
+            seen.add(image.product_id)
+            if image.image:
+                summary = summaries[image.product_id]
+                summary.main_image_url = image.image.url
+                summary.main_image_renditions = image.get_renditions()
+
+        cls.objects.bulk_create(
+            summaries.values(),
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=[
+                "min_price",
+                "max_price",
+                "available",
+                "orders_count",
+                "main_image_url",
+                "main_image_renditions",
+            ],
+        )
@@ -0,0 +1,47 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from .models import Product
+
+PAGE_TIMEOUT = 60 * 60 * 24
+
+# Rendered in place of the CSRF token and swapped for the real one per request.
+CSRF_PLACEHOLDER = "__product_page_csrf_token__"
+
+
+def _new_version():
+    return uuid4().hex[:12]
+
+
+def get_version_key(slug):
+    return f"catalog:product_version:{slug}"
+
+
+def get_page_key(slug, create=True):
+    """Cache key of the rendered product page for its current version.
+
+    A missing version gets a fresh random one rather than a counter reset,
+    so an evicted version can never resurrect an older page. Versions
+    expire like the pages they point to. With ``create=False`` a missing
+    version returns None instead, so lookups of unknown slugs store nothing.
+    """
+    key = get_version_key(slug)
+    if create:
+        version = cache.get_or_set(key, _new_version, PAGE_TIMEOUT)
+    else:
+        version = cache.get(key)
+        if version is None:
+            return None
+    return f"catalog:product_page:{slug}:{version}"
+
+
+def bump_product_versions(slugs):
+    cache.set_many(
+        {get_version_key(slug): _new_version() for slug in slugs}, PAGE_TIMEOUT
+    )
+
+
+def invalidate_product_pages(product_ids):
+    slugs = Product.objects.filter(id__in=product_ids).values_list("slug", flat=True)
+    bump_product_versions(slugs)
@@ -0,0 +1,170 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+
+# Stand-ins for NULL sort values, so nullable columns can take part in
+# plain comparisons. They sort after every real value.
+NULL_SENTINELS = {
+    "DecimalField": Decimal("99999999.99"),
+    "IntegerField": 2**31 - 1,
+    "PositiveIntegerField": 2**31 - 1,
+}
+
+
+def approximate_count(queryset):
+    """Row estimate from the PostgreSQL planner, exact count elsewhere."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]["Plan Rows"]
+
+
+class ApproximateCountPaginator(Paginator):
+    """Offset paginator whose page count comes from the planner estimate."""
+
+    @cached_property
+    def count(self):
+        return approximate_count(self.object_list)
+
+
+def _resolve_field(model, path):
+    field = None
+    for name in path.split("__"):
+        field = model._meta.get_field(name)
+        model = field.related_model
+    return field
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, paginator):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.paginator = paginator
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """Cursor pagination over an ordered queryset.
+
+    Each sort field becomes a ``_keyN`` annotation and ``id`` is appended
+    as a tiebreaker, so a page is fetched with a WHERE on the last row's
+    keys instead of an OFFSET scan. Cursors are signed to keep them opaque.
+    """
+
+    salt = "catalog.pagination.keyset"
+
+    def __init__(self, queryset, per_page, ordering, approximate=False):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.approximate = approximate
+
+        self.keys = []
+        annotations = {}
+        for i, name in enumerate(ordering):
+            descending = name.startswith("-")
+            path = name.lstrip("-")
+            field = _resolve_field(queryset.model, path)
+            alias = f"_key{i}"
+            if field.null:
+                sentinel = NULL_SENTINELS[field.get_internal_type()]
+                annotations[alias] = Coalesce(
+                    F(path), Value(sentinel), output_field=field.clone()
+                )
+            else:
+                annotations[alias] = F(path)
+            self.keys.append((alias, field, descending))
+
+        last_descending = self.keys[-1][2] if self.keys else False
+        self.keys.append(("id", queryset.model._meta.pk, last_descending))
+        self.annotations = annotations
+
+    @classmethod
+    def supports(cls, model, ordering):
+        """Whether ``ordering`` only uses field paths this paginator can key on."""
+        for name in ordering:
+            if not isinstance(name, str):
+                return False
+            try:
+                field = _resolve_field(model, name.lstrip("-"))
+            except (AttributeError, FieldDoesNotExist):
+                return False
+            if field is None or field.is_relation:
+                return False
+            if field.null and field.get_internal_type() not in NULL_SENTINELS:
+                return False
+        return True
+
+    @cached_property
+    def count(self):
+        if self.approximate:
+            return approximate_count(self.queryset)
+        return self.queryset.count()
+
+    def _encode(self, obj):
+        values = []
+        for alias, _, _ in self.keys:
+            value = getattr(obj, alias)
+            if isinstance(value, (Decimal, datetime)):
+                value = str(value) if isinstance(value, Decimal) else value.isoformat()
+            values.append(value)
+        return signing.dumps(values, salt=self.salt, compress=True)
+
+    def _decode(self, cursor):
+        try:
+            values = signing.loads(cursor, salt=self.salt)
+            if len(values) != len(self.keys):
+                return None
+            return [
+                field.to_python(value)
+                for value, (_, field, _) in zip(values, self.keys)
+            ]
+        except (signing.BadSignature, ValidationError, TypeError):
+            return None
+
+    def _after(self, values):
+        # (k0 > v0) OR (k0 = v0 AND k1 > v1) OR ... with per-key direction
+        condition = Q()
+        equal = Q()
+        for (alias, _, descending), value in zip(self.keys, values):
+            lookup = "lt" if descending else "gt"
+            condition |= equal & Q(**{f"{alias}__{lookup}": value})
+            equal &= Q(**{alias: value})
+        return condition
+
+    def page(self, cursor=None):
+        queryset = self.queryset.annotate(**self.annotations).order_by(
+            *(f"-{alias}" if desc else alias for alias, _, desc in self.keys)
+        )
+        values = self._decode(cursor) if cursor else None
+        if values is not None:
+            queryset = queryset.filter(self._after(values))
+
+        rows = list(queryset[: self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[: self.per_page]
+            next_cursor = self._encode(rows[-1])
+        return KeysetPage(rows, next_cursor, self)
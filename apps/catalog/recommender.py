@@ -1,5 +1,13 @@
+import asyncio
+import hashlib
+import weakref
+
 import redis
+import redis.asyncio
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.urls import reverse
 from .models import Product
  # connect to redis
 r = redis.Redis(
@@ -7,56 +15,174 @@ r = redis.Redis(
     port=settings.REDIS_PORT
 )
 
+# KEYS[1] is the order marker, KEYS[2..n] the purchased_with sets of the
+# products in ARGV[2..n]. The marker makes replays of the same order a no-op.
+RECORD_ORDER_SCRIPT = """
+if not redis.call('SET', KEYS[1], 1, 'NX', 'EX', ARGV[1]) then
+    return 0
+end
+for i = 2, #KEYS do
+    for j = 2, #KEYS do
+        if i ~= j then
+            redis.call('ZINCRBY', KEYS[i], 1, ARGV[j])
+        end
+    end
+end
+return 1
+"""
+record_order = r.register_script(RECORD_ORDER_SCRIPT)
+
+# ARGV[1] is the number of results, ARGV[2..n] the ids to leave out.
+SUGGEST_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local exclude = {}
+for i = 2, #ARGV do
+    exclude[ARGV[i]] = true
+end
+local scores = redis.call('ZUNION', #KEYS, unpack(KEYS))
+local result = {}
+-- ZUNION returns members by ascending score, so walk it backwards
+for i = #scores, 1, -1 do
+    if not exclude[scores[i]] then
+        result[#result + 1] = scores[i]
+        if #result >= limit then
+            break
+        end
+    end
+end
+return result
+"""
+suggest = r.register_script(SUGGEST_SCRIPT)
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis():
+    """Async client for the running event loop.
+
+    Its connections belong to the loop that opened them, so each loop
+    (one per ASGI worker) gets its own client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = redis.asyncio.Redis(
+            host=settings.REDIS_HOST, port=settings.REDIS_PORT
+        )
+        _async_clients[loop] = client
+    return client
+
+
 class Recommender:
     def get_product_key(self, id):
         return f'product:{id}:purchased_with'
 
-    def products_bought(self, products):
-        product_ids = [p.id for p in products]
-        for product_id in product_ids:
-            for with_id in product_ids:
-                # get the other products bought with each product
-                if product_id != with_id:
-                    # increment score for product purchased together
-                    r.zincrby(
-                        self.get_product_key(product_id), 1, with_id
-                    )
+    def get_order_key(self, order_id):
+        return f'order:{order_id}:recommended'
+
+    def order_products_bought(self, order_id, product_ids, pipe=None):
+        """Record the products of an order once, however often it's called.
+
+        Runs as one server-side script and returns False if the order was
+        already recorded. When a pipeline is passed the script is queued on
+        it instead, so several orders can share one round trip.
+        """
+        product_ids = sorted(set(product_ids))
+        keys = [self.get_order_key(order_id)]
+        keys += [self.get_product_key(id) for id in product_ids]
+        args = [settings.RECOMMENDER_ORDER_TTL, *product_ids]
+
+        if pipe is not None:
+            record_order(keys=keys, args=args, client=pipe)
+            return None
+        return bool(record_order(keys=keys, args=args, client=r))
+
+    def _suggest_cache_key(self, product_ids, max_results):
+        signature = ','.join(str(id) for id in product_ids)
+        return 'recommender:suggest:{}:{}'.format(
+            max_results, hashlib.md5(signature.encode()).hexdigest()
+        )
 
     def suggest_products_for(self, products, max_results=6):
-        product_ids = [p.id for p in products]
+        """Top suggestions for a cart as lightweight product cards.
+
+        Results are cached per set of product ids for a short while.
+        """
+        product_ids = sorted({p.id for p in products})
+        cache_key = self._suggest_cache_key(product_ids, max_results)
+        cards = cache.get(cache_key)
+        if cards is None:
+            suggested_ids = self._suggested_ids(product_ids, max_results)
+            cards = self._product_cards(suggested_ids)
+            cache.set(cache_key, cards, settings.RECOMMENDER_SUGGEST_TTL)
+        return cards
 
-        if len(products) == 1:
-            # only 1 product
+    async def asuggest_products_for(self, products, max_results=6):
+        """suggest_products_for() on the async Redis client and ORM."""
+        product_ids = sorted({p.id for p in products})
+        cache_key = self._suggest_cache_key(product_ids, max_results)
+        cards = await cache.aget(cache_key)
+        if cards is None:
+            suggested_ids = await self._asuggested_ids(product_ids, max_results)
+            cards = await self._aproduct_cards(suggested_ids)
+            await cache.aset(cache_key, cards, settings.RECOMMENDER_SUGGEST_TTL)
+        return cards
+
+    def _suggested_ids(self, product_ids, max_results):
+        if len(product_ids) == 1:
+            # only 1 product, fetch just the top of its set
             suggestions = r.zrange(
-                self.get_product_key(product_ids[0]), 0, -1, desc=True
-            )[:max_results]
+                self.get_product_key(product_ids[0]), 0, max_results - 1, desc=True
+            )
         else:
-            # generate a temporary key
-            flat_ids = ''.join([str(id) for id in product_ids])
-            tmp_key = f'tmp_{flat_ids}'
-            # multiple products, combine scores of all products
-            # store the resulting sorted set in a temporary key
+            # combine the scores of all products server-side, without a
+            # temporary key, and only send back the top results
             keys = [self.get_product_key(id) for id in product_ids]
-            r.zunionstore(tmp_key, keys)
-            # remove ids for the products the recommendation is for
-            r.zrem(tmp_key, *product_ids)
-            # get the product ids by their score, descendant sort
-            suggestions = r.zrange(
-                tmp_key, 0, -1, desc=True
-            )[:max_results]
-            # remove the temporary key
-            r.delete(tmp_key)
-        suggested_products_ids = [int(id) for id in suggestions]
-        # get suggested products and sort by order of appearance
-        suggested_products = list(
-            Product.objects.filter(id__in=suggested_products_ids)
-        )
-        suggested_products.sort(
-            key=lambda x: suggested_products_ids.index(x.id)
+            suggestions = suggest(
+                keys=keys, args=[max_results, *product_ids], client=r
+            )
+        return [int(id) for id in suggestions]
+
+    async def _asuggested_ids(self, product_ids, max_results):
+        client = get_async_redis()
+        if len(product_ids) == 1:
+            suggestions = await client.zrange(
+                self.get_product_key(product_ids[0]), 0, max_results - 1, desc=True
+            )
+        else:
+            keys = [self.get_product_key(id) for id in product_ids]
+            suggestions = await client.register_script(SUGGEST_SCRIPT)(
+                keys=keys, args=[max_results, *product_ids]
+            )
+        return [int(id) for id in suggestions]
+
+    def _product_cards_query(self, product_ids):
+        return Product.objects.filter(id__in=product_ids).values(
+            'id',
+            'name',
+            'slug',
+            min_price=F('summary__min_price'),
+            image_url=F('summary__main_image_url'),
         )
 
-        return suggested_products
+    def _product_cards(self, product_ids, rows=None):
+        if rows is None:
+            rows = self._product_cards_query(product_ids)
+        cards = {}
+        for row in rows:
+            row['url'] = reverse('catalog:product_detail', args=[row['slug']])
+            cards[row['id']] = row
+        # keep the recommendation order
+        return [cards[id] for id in product_ids if id in cards]
+
+    async def _aproduct_cards(self, product_ids):
+        rows = [row async for row in self._product_cards_query(product_ids)]
+        return self._product_cards(product_ids, rows)
 
     def clear_purchases(self):
-        for id in Product.objects.values_list('id', flat=True):
-            r.delete(self.get_product_key(id))
\ No newline at end of file
+        with r.pipeline(transaction=False) as pipe:
+            for id in Product.objects.values_list('id', flat=True).iterator():
+                pipe.delete(self.get_product_key(id))
+            for key in r.scan_iter(match=self.get_order_key('*'), count=1000):
+                pipe.delete(key)
+            pipe.execute()
@@ -0,0 +1,71 @@
+import posixpath
+import re
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+RENDITION_WIDTHS = (320, 640, 1024, 1600)
+RENDITION_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 6}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def get_rendition_name(name, width, fmt):
+    """Storage name of a rendition, stored next to the original upload."""
+    stem, _ = posixpath.splitext(name)
+    return f"{stem}_{width}w.{fmt}"
+
+
+def generate_renditions(image_field):
+    """Write resized copies of ``image_field`` and return their URLs.
+
+    The result is what ``ProductImage.renditions`` stores::
+
+        {"source": <original name>,
+         "sizes": [{"width": 320, "webp": <url>, "jpeg": <url>}, ...]}
+
+    Renditions are never upscaled; an image narrower than the smallest
+    width gets a single re-encoded copy at its own size.
+    """
+    storage = image_field.storage
+    with storage.open(image_field.name, "rb") as f:
+        with Image.open(f) as original:
+            original = ImageOps.exif_transpose(original)
+            original = original.convert("RGB")
+
+    widths = [w for w in RENDITION_WIDTHS if w < original.width]
+    widths.append(min(original.width, RENDITION_WIDTHS[-1]))
+
+    sizes = []
+    for width in sorted(set(widths)):
+        height = round(original.height * width / original.width)
+        resized = original.resize((width, height), Image.Resampling.LANCZOS)
+        size = {"width": width}
+        for fmt, (pil_format, options) in RENDITION_FORMATS.items():
+            out = BytesIO()
+            resized.save(out, pil_format, **options)
+            name = get_rendition_name(image_field.name, width, fmt)
+            # overwrite a previous run instead of piling up suffixed copies
+            storage.delete(name)
+            name = storage.save(name, ContentFile(out.getvalue()))
+            size[fmt] = storage.url(name)
+        sizes.append(size)
+
+    return {"source": image_field.name, "sizes": sizes}
+
+
+def delete_renditions(name, storage=default_storage):
+    """Remove every rendition generated for the original ``name``."""
+    directory, filename = posixpath.split(name)
+    stem, _ = posixpath.splitext(filename)
+    pattern = re.compile(rf"{re.escape(stem)}_\d+w\.({'|'.join(RENDITION_FORMATS)})$")
+    try:
+        _, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for file in files:
+        if pattern.match(file):
+            storage.delete(posixpath.join(directory, file))
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db.models import F, Q, Value
+
+from .models import Product
+
+
+def _vector(text, weight):
+    return SearchVector(
+        Value(text), weight=weight, config=settings.CATALOG_SEARCH_CONFIG
+    )
+
+
+def _flatten_specs(specs):
+    if isinstance(specs, dict):
+        for key, value in specs.items():
+            yield str(key)
+            yield from _flatten_specs(value)
+    elif isinstance(specs, list):
+        for value in specs:
+            yield from _flatten_specs(value)
+    elif specs is not None:
+        yield str(specs)
+
+
+def update_search_vectors(product_ids):
+    products = (
+        Product.objects.filter(id__in=product_ids)
+        .select_related("brand", "category")
+        .prefetch_related("variants__attributes")
+    )
+    for product in products:
+        attribute_values = {
+            value.value
+            for variant in product.variants.all()
+            for value in variant.attributes.all()
+        }
+        vector = (
+            _vector(product.name, "A")
+            + _vector(f"{product.brand.name} {product.category.name}", "B")
+            + _vector(" ".join(sorted(attribute_values)), "C")
+            + _vector(" ".join(_flatten_specs(product.specs)), "C")
+            + _vector(product.description, "D")
+        )
+        # update() skips post_save, so this doesn't re-trigger the signal
+        Product.objects.filter(pk=product.pk).update(search_vector=vector)
+
+
+def search_products(queryset, text):
+    """Full-text match ranked by relevance, with trigram fallback for typos."""
+    query = SearchQuery(
+        text, search_type="websearch", config=settings.CATALOG_SEARCH_CONFIG
+    )
+    return (
+        queryset.annotate(
+            search_rank=SearchRank(F("search_vector"), query),
+            search_similarity=TrigramSimilarity("name", text),
+        )
+        .filter(Q(search_vector=query) | Q(name__trigram_similar=text))
+        .order_by("-search_rank", "-search_similarity")
+    )
@@ -0,0 +1,194 @@
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from .models import (
+    Attribute,
+    AttributeValue,
+    Brand,
+    Category,
+    Product,
+    ProductImage,
+    ProductSummary,
+    ProductVariant,
+    stock_availability_changed,
+)
+from .page_cache import bump_product_versions, invalidate_product_pages
+from .renditions import delete_renditions
+from .search import update_search_vectors
+from .tasks import generate_image_renditions
+from .taxonomy import bump_taxonomy_version
+from .variant_index import get_cache_key as get_variant_index_key
+from .variant_index import invalidate_variant_index
+
+
+@receiver(post_save, sender=ProductVariant)
+def variant_saved(sender, instance, **kwargs):
+    ProductSummary.refresh_prices(instance.product_id)
+    Product.touch([instance.product_id])
+    invalidate_variant_index([instance.product_id])
+    invalidate_product_pages([instance.product_id])
+
+
+@receiver(stock_availability_changed)
+def variant_stock_availability_changed(sender, product_ids, **kwargs):
+    for product_id in product_ids:
+        ProductSummary.refresh_prices(product_id)
+    Product.touch(product_ids)
+    # a checkout that rolls back must not leave rebuilt caches behind
+    transaction.on_commit(partial(invalidate_variant_index, product_ids))
+    transaction.on_commit(partial(invalidate_product_pages, product_ids))
+
+
+@receiver(post_delete, sender=ProductVariant)
+def variant_deleted(sender, instance, **kwargs):
+    ProductSummary.refresh_prices(instance.product_id, create=False)
+    Product.touch([instance.product_id])
+    invalidate_variant_index([instance.product_id])
+    invalidate_product_pages([instance.product_id])
+    update_search_vectors([instance.product_id])
+
+
+@receiver(m2m_changed, sender=ProductVariant.attributes.through)
+def variant_attributes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        product_ids = [instance.product_id]
+    elif action == "pre_clear":
+        # instance is an AttributeValue about to lose all its variants
+        product_ids = instance.variants.values("product_id")
+    else:
+        product_ids = ProductVariant.objects.filter(id__in=pk_set).values(
+            "product_id"
+        )
+    Product.touch(product_ids)
+    invalidate_variant_index(product_ids)
+    invalidate_product_pages(product_ids)
+    update_search_vectors(product_ids)
+
+
+@receiver(post_save, sender=ProductImage)
+def image_saved(sender, instance, **kwargs):
+    ProductSummary.refresh_image(instance.product_id)
+    Product.touch([instance.product_id])
+    invalidate_variant_index([instance.product_id])
+    invalidate_product_pages([instance.product_id])
+    if instance.image and not instance.get_renditions():
+        transaction.on_commit(partial(generate_image_renditions.delay, instance.pk))
+
+
+@receiver(post_delete, sender=ProductImage)
+def image_deleted(sender, instance, **kwargs):
+    ProductSummary.refresh_image(instance.product_id, create=False)
+    Product.touch([instance.product_id])
+    invalidate_variant_index([instance.product_id])
+    invalidate_product_pages([instance.product_id])
+    source = instance.renditions.get("source")
+    if source:
+        storage = instance.image.storage
+        transaction.on_commit(partial(delete_renditions, source, storage))
+
+
+@receiver(pre_save, sender=Product)
+def product_saving(sender, instance, **kwargs):
+    # remembered so a rename also drops what is cached under the old slug
+    instance._stored_slug = (
+        Product.objects.filter(pk=instance.pk).values_list("slug", flat=True).first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, instance, **kwargs):
+    slugs = {instance.slug, getattr(instance, "_stored_slug", None) or instance.slug}
+    cache.delete_many([get_variant_index_key(slug) for slug in slugs])
+    bump_product_versions(slugs)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    update_search_vectors([instance.id])
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+def taxonomy_saved(sender, instance, created, **kwargs):
+    if not created:
+        product_ids = instance.products.values("id")
+        Product.touch(product_ids)
+        update_search_vectors(product_ids)
+        # product pages show the category in their breadcrumbs
+        invalidate_product_pages(product_ids)
+
+
+@receiver(post_save, sender=AttributeValue)
+def attribute_value_saved(sender, instance, **kwargs):
+    product_ids = Product.objects.filter(variants__attributes=instance).values("id")
+    Product.touch(product_ids)
+    invalidate_variant_index(product_ids)
+    invalidate_product_pages(product_ids)
+    update_search_vectors(product_ids)
+
+
+@receiver(post_save, sender=Attribute)
+def attribute_saved(sender, instance, **kwargs):
+    product_ids = Product.objects.filter(
+        variants__attributes__attribute=instance
+    ).values("id")
+    Product.touch(product_ids)
+    invalidate_variant_index(product_ids)
+    invalidate_product_pages(product_ids)
+
+
+@receiver(pre_delete, sender=Attribute)
+@receiver(pre_delete, sender=AttributeValue)
+def attribute_deleting(sender, instance, **kwargs):
+    # the variant links and image references are gone by post_delete
+    path = "attributes__attribute" if sender is Attribute else "attributes"
+    image_path = (
+        "attribute_value__attribute" if sender is Attribute else "attribute_value"
+    )
+    product_ids = set(
+        Product.objects.filter(**{f"variants__{path}": instance}).values_list(
+            "id", flat=True
+        )
+    )
+    product_ids.update(
+        Product.objects.filter(**{f"images__{image_path}": instance}).values_list(
+            "id", flat=True
+        )
+    )
+    instance._product_ids = product_ids
+
+
+@receiver(post_delete, sender=Attribute)
+@receiver(post_delete, sender=AttributeValue)
+def attribute_deleted(sender, instance, **kwargs):
+    product_ids = getattr(instance, "_product_ids", ())
+    if not product_ids:
+        return
+    Product.touch(product_ids)
+    invalidate_variant_index(product_ids)
+    invalidate_product_pages(product_ids)
+    update_search_vectors(product_ids)
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Brand)
+@receiver([post_save, post_delete], sender=Attribute)
+@receiver([post_save, post_delete], sender=AttributeValue)
+@receiver(m2m_changed, sender=Category.available_attributes.through)
+def taxonomy_changed(sender, **kwargs):
+    # after commit, so no process reloads the snapshot from uncommitted data
+    transaction.on_commit(bump_taxonomy_version)
@@ -0,0 +1,37 @@
+from celery import shared_task
+
+from .feeds import FEEDS, build_feed
+from .models import ProductImage, ProductSummary
+from .page_cache import invalidate_product_pages
+from .renditions import delete_renditions, generate_renditions
+from .variant_index import invalidate_variant_index
+
+
+@shared_task
+def generate_image_renditions(image_id, force=False):
+    """Create the resized WebP/JPEG copies of a product image."""
+    image = ProductImage.objects.filter(pk=image_id).first()
+    if image is None or not image.image:
+        return
+    if image.get_renditions() and not force:
+        return
+
+    previous = image.renditions.get("source")
+    if previous and previous != image.image.name:
+        delete_renditions(previous, image.image.storage)
+
+    renditions = generate_renditions(image.image)
+    # skip the write if the image was replaced while we were working
+    updated = ProductImage.objects.filter(
+        pk=image.pk, image=image.image.name
+    ).update(renditions=renditions)
+    if updated:
+        ProductSummary.refresh_image(image.product_id, create=False)
+        invalidate_variant_index([image.product_id])
+        invalidate_product_pages([image.product_id])
+
+
+@shared_task
+def build_product_feeds(full=False):
+    """Refresh the stored marketplace feeds, incrementally by default."""
+    return {fmt: build_feed(fmt, full=full) for fmt in FEEDS}
@@ -0,0 +1,84 @@
+import time
+from collections import defaultdict
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from .models import Attribute, AttributeValue, Brand, Category
+
+VERSION_KEY = "catalog:taxonomy_version"
+
+# How often a process asks the cache whether its snapshot is still current.
+CHECK_INTERVAL = 1
+
+_snapshot = None
+_checked_at = 0.0
+
+
+class TaxonomySnapshot:
+    """Categories, brands, attributes and their values held in memory.
+
+    Built with a handful of queries and shared by all requests of a
+    process; with gunicorn's preload_app it is loaded once in the master
+    and inherited by every worker.
+    """
+
+    def __init__(self, version):
+        self.version = version
+
+        self.categories = list(Category.objects.all())
+        self.categories_by_slug = {c.slug: c for c in self.categories}
+        self.brands = list(Brand.objects.all())
+
+        attributes = {a.id: a for a in Attribute.objects.all()}
+        self.values_by_attribute = defaultdict(list)
+        for value in AttributeValue.objects.order_by("id"):
+            # keeps str(value) from fetching the attribute again
+            value.attribute = attributes[value.attribute_id]
+            self.values_by_attribute[value.attribute_id].append(value)
+
+        self.attributes_by_category = defaultdict(list)
+        links = Category.available_attributes.through.objects.order_by("id")
+        for category_id, attribute_id in links.values_list(
+            "category_id", "attribute_id"
+        ):
+            self.attributes_by_category[category_id].append(attributes[attribute_id])
+
+    def get_category(self, slug):
+        return self.categories_by_slug.get(slug)
+
+    def get_attributes(self, category):
+        return self.attributes_by_category.get(category.id, [])
+
+    def get_values(self, attribute):
+        return self.values_by_attribute.get(attribute.id, [])
+
+
+def _new_version():
+    return uuid4().hex[:12]
+
+
+def load():
+    """Build the snapshot for the current version and keep it in the process."""
+    global _snapshot, _checked_at
+    version = cache.get_or_set(VERSION_KEY, _new_version, None)
+    _snapshot = TaxonomySnapshot(version)
+    _checked_at = time.monotonic()
+    return _snapshot
+
+
+def get_taxonomy():
+    global _checked_at
+    if _snapshot is None:
+        return load()
+
+    now = time.monotonic()
+    if now - _checked_at >= CHECK_INTERVAL:
+        _checked_at = now
+        if cache.get(VERSION_KEY) != _snapshot.version:
+            return load()
+    return _snapshot
+
+
+def bump_taxonomy_version():
+    cache.set(VERSION_KEY, _new_version(), None)
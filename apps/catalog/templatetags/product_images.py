@@ -0,0 +1,26 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(renditions, fmt="webp"):
+    """Build a ``srcset`` value from ``ProductImage.renditions``."""
+    if not renditions:
+        return ""
+    return ", ".join(
+        f"{size[fmt]} {size['width']}w" for size in renditions.get("sizes", [])
+    )
+
+
+@register.inclusion_tag("catalog/_picture.html")
+def picture(src, renditions, alt="", css="", sizes="100vw"):
+    """Render a <picture> with WebP and JPEG sources, falling back to ``src``."""
+    return {
+        "src": src,
+        "webp": srcset(renditions, "webp"),
+        "jpeg": srcset(renditions, "jpeg"),
+        "alt": alt,
+        "css": css,
+        "sizes": sizes,
+    }
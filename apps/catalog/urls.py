@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
@@ -14,9 +15,14 @@ urlpatterns = [
     path(
         "product/<slug:slug>/", views.ProductDetailView.as_view(), name="product_detail"
     ),
+    path("feeds/products.<str:fmt>.gz", views.product_feed, name="product_feed"),
     path(
         "product/<slug:slug>/variant/",
-        views.ProductVariantHTMXView.as_view(),
+        (
+            views.ProductVariantHTMXAsyncView
+            if settings.ASYNC_VIEWS
+            else views.ProductVariantHTMXView
+        ).as_view(),
         name="product_variant_htmx",
     ),
 ]
@@ -0,0 +1,112 @@
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .images import ImageResolver
+from .models import AttributeValue, Product
+
+INDEX_TIMEOUT = 60 * 60 * 24
+
+
+def get_cache_key(slug):
+    return f"catalog:variant_index:{slug}"
+
+
+class VariantIndex:
+    """Maps a frozen set of (attribute slug, value) pairs to variant data."""
+
+    def __init__(self, entries):
+        # entries keep the variant ordering so partial selections resolve
+        # to the same variant the old `.first()` lookup returned
+        self.entries = entries
+        self.by_attrs = {attrs: data for attrs, data in entries}
+
+    def resolve(self, selection):
+        attrs = frozenset(selection.items())
+        data = self.by_attrs.get(attrs)
+        if data is not None:
+            return data
+
+        for variant_attrs, data in self.entries:
+            if attrs <= variant_attrs:
+                return data
+        return None
+
+
+def _variants(product):
+    return product.variants.order_by("id").prefetch_related(
+        Prefetch(
+            "attributes",
+            queryset=AttributeValue.objects.select_related("attribute"),
+        )
+    )
+
+
+def build_variant_index(product):
+    return _build_index(ImageResolver(product.images.all()), _variants(product))
+
+
+async def abuild_variant_index(product):
+    images = [image async for image in product.images.all()]
+    variants = [variant async for variant in _variants(product)]
+    return _build_index(ImageResolver(images), variants)
+
+
+def _build_index(resolver, variants):
+    entries = []
+    for variant in variants:
+        attrs = list(variant.attributes.all())
+        gallery = resolver.get_images(variant)
+
+        entries.append(
+            (
+                frozenset((attr.attribute.slug, attr.value) for attr in attrs),
+                {
+                    "id": variant.id,
+                    "sku": variant.sku,
+                    "price": variant.price,
+                    "available": variant.in_stock,
+                    "image_url": (
+                        gallery[0].image.url if gallery and gallery[0].image else None
+                    ),
+                    "image_renditions": (
+                        gallery[0].get_renditions() if gallery else {}
+                    ),
+                    "images": [
+                        {"url": img.image.url, "renditions": img.get_renditions()}
+                        for img in gallery
+                        if img.image
+                    ],
+                },
+            )
+        )
+
+    return VariantIndex(entries)
+
+
+def get_variant_index(slug):
+    key = get_cache_key(slug)
+    index = cache.get(key)
+    if index is None:
+        product = Product.objects.filter(slug=slug).first()
+        if product is None:
+            return None
+        index = build_variant_index(product)
+        cache.set(key, index, INDEX_TIMEOUT)
+    return index
+
+
+async def aget_variant_index(slug):
+    key = get_cache_key(slug)
+    index = await cache.aget(key)
+    if index is None:
+        product = await Product.objects.filter(slug=slug).afirst()
+        if product is None:
+            return None
+        index = await abuild_variant_index(product)
+        await cache.aset(key, index, INDEX_TIMEOUT)
+    return index
+
+
+def invalidate_variant_index(product_ids):
+    slugs = Product.objects.filter(id__in=product_ids).values_list("slug", flat=True)
+    cache.delete_many([get_cache_key(slug) for slug in slugs])
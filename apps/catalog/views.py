@@ -1,14 +1,30 @@
+from datetime import timedelta
 from string import printable
 
+from cart.cart import aget_cart
 from cart.forms import CartAddProductForm
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.core.paginator import Paginator
-from django.db.models import Count, Min, Prefetch
-from django.shortcuts import get_object_or_404, render
+from django.db.models import F, Prefetch
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.safestring import mark_safe
 from django.views.generic import DetailView, ListView, View
 
+from .feeds import FEEDS, generate_feed, get_manifest, gzip_stream
 from .filters import ProductFilter
-from .models import AttributeValue, Category, Product, ProductImage
+from .models import AttributeValue, Product, ProductVariant
+from .page_cache import CSRF_PLACEHOLDER, PAGE_TIMEOUT, get_page_key
+from .pagination import ApproximateCountPaginator, KeysetPaginator
 from .recommender import Recommender
+from .taxonomy import get_taxonomy
+from .variant_index import aget_variant_index, get_variant_index
 
 
 class ProductListView(ListView):
@@ -18,7 +34,7 @@ class ProductListView(ListView):
     paginate_by = 9
 
     def get_queryset(self):
-        qs = Product.objects.all()
+        qs = Product.objects.select_related("category").defer("search_vector")
 
         category_slug = self.request.GET.get("category") or self.kwargs.get(
             "category_slug"
@@ -26,15 +42,16 @@ class ProductListView(ListView):
         self.category = None
 
         if category_slug:
-            self.category = get_object_or_404(Category, slug=category_slug)
+            self.category = get_taxonomy().get_category(category_slug)
+            if self.category is None:
+                raise Http404("No category matches the given query.")
             qs = qs.filter(category=self.category)
 
-        main_images = ProductImage.objects.filter(is_main=True)
         qs = qs.annotate(
-            min_price=Min("variants__price"),
-            orders_count=Count("variants__order_items"),
-        ).prefetch_related(
-            Prefetch("images", queryset=main_images, to_attr="main_img_list")
+            min_price=F("summary__min_price"),
+            orders_count=F("summary__orders_count"),
+            main_image_url=F("summary__main_image_url"),
+            main_image_renditions=F("summary__main_image_renditions"),
         )
 
         self.filterset = ProductFilter(
@@ -43,10 +60,44 @@ class ProductListView(ListView):
 
         return self.filterset.qs.distinct()
 
+    def get_paginator(self, queryset, per_page, **kwargs):
+        if settings.CATALOG_APPROXIMATE_COUNT:
+            return ApproximateCountPaginator(queryset, per_page, **kwargs)
+        return super().get_paginator(queryset, per_page, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        self.keyset = False
+        if settings.CATALOG_PAGINATION == "keyset":
+            # search results are ordered by rank and keep offset pagination
+            ordering = queryset.query.order_by or queryset.model._meta.ordering
+            if KeysetPaginator.supports(queryset.model, ordering):
+                self.keyset = True
+                paginator = KeysetPaginator(
+                    queryset,
+                    page_size,
+                    ordering,
+                    approximate=settings.CATALOG_APPROXIMATE_COUNT,
+                )
+                page = paginator.page(self.request.GET.get("cursor"))
+                return paginator, page, page.object_list, page.has_next()
+        return super().paginate_queryset(queryset, page_size)
+
+    def get_template_names(self):
+        # "load more" requests only need the next batch of cards
+        if self.request.headers.get("HX-Request") and self.keyset:
+            return ["catalog/_product_cards.html"]
+        return super().get_template_names()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        params.pop("page", None)
+        params.pop("cursor", None)
+        context["keyset"] = self.keyset
+        context["approximate_count"] = settings.CATALOG_APPROXIMATE_COUNT
+        context["query_string"] = params.urlencode()
         context["category"] = self.category
-        context["categories"] = Category.objects.all()
+        context["categories"] = get_taxonomy().categories
         context["filter"] = self.filterset
         return context
 
@@ -54,30 +105,63 @@ class ProductListView(ListView):
 class ProductDetailView(DetailView):
     model = Product
     template_name = "catalog/product_detail.html"
+    fragment_template_name = "catalog/_product_detail.html"
     context_object_name = "product"
     slug_field = "slug"
     slug_url_kwarg = "slug"
 
+    def get(self, request, *args, **kwargs):
+        # The product part of the page is the same for every visitor, so it
+        # is rendered once per product version; base.html (cart badge etc.)
+        # is still rendered per request.
+        slug = kwargs[self.slug_url_kwarg]
+        key = get_page_key(slug, create=False)
+        content = cache.get(key) if key else None
+        if content is None:
+            # 404s before a version is stored for the slug
+            self.object = self.get_object()
+            key = key or get_page_key(slug)
+            context = self.get_context_data(object=self.object)
+            context["csrf_token"] = CSRF_PLACEHOLDER
+            content = render_to_string(self.fragment_template_name, context)
+            cache.set(key, content, PAGE_TIMEOUT)
+
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+        return render(request, self.template_name, {"content": mark_safe(content)})
+
     def get_queryset(self):
         return (
             super()
             .get_queryset()
             .select_related("category", "brand")
-            .prefetch_related("images", "variants__attributes__attribute")
+            .prefetch_related(
+                "images",
+                Prefetch(
+                    "variants",
+                    queryset=ProductVariant.objects.order_by("id").prefetch_related(
+                        Prefetch(
+                            "attributes",
+                            queryset=AttributeValue.objects.select_related("attribute"),
+                        )
+                    ),
+                ),
+            )
         )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        variants = self.object.variants.prefetch_related("attributes__attribute").all()
+        variants = self.object.variants.all()
 
-        default_variant = variants.first()
+        default_variant = variants[0] if variants else None
         context["default_variant"] = default_variant
+        # images are prefetched main-first
+        context["main_image"] = next(iter(self.object.images.all()), None)
 
         # Create a set of Attribute IDs belonging to the default variant.
         # We pass this to the template to mark the correct radio buttons as 'checked'.
         if default_variant:
-            selected_ids = set(default_variant.attributes.values_list("id", flat=True))
+            selected_ids = {attr.id for attr in default_variant.attributes.all()}
         else:
             selected_ids = set()
 
@@ -107,24 +191,66 @@ class ProductDetailView(DetailView):
 
 class ProductVariantHTMXView(View):
     def get(self, request, slug):
-        product = get_object_or_404(Product, slug=slug)
+        index = get_variant_index(slug)
+        if index is None:
+            raise Http404("No product matches the given query.")
 
-        filters = request.GET.dict()
+        # Selections arrive as ?color=Ionic%20White&profile-switch=Brown and are
+        # resolved against the cached attribute-combination index.
+        variant = index.resolve(request.GET.dict())
 
-        variants = product.variants.all()
+        return render(
+            request,
+            "catalog/_variant_info.html",
+            {"variant": variant, "cart_product_form": CartAddProductForm()},
+        )
 
-        # Iteratively filter variants based on ALL selected attributes (AND logic).
-        # Assumes that request.GET contains pairs like ?color=Ionic%20White&profile-switch=Brown.
-        for attr, value in filters.items():
-            variants = variants.filter(
-                attributes__attribute__slug=attr,
-                attributes__value=value,
-            )
 
-        variant = variants.first()
+class ProductVariantHTMXAsyncView(View):
+    """ProductVariantHTMXView for ASGI, see settings.ASYNC_VIEWS."""
+
+    async def get(self, request, slug):
+        index = await aget_variant_index(slug)
+        if index is None:
+            raise Http404("No product matches the given query.")
+        variant = index.resolve(request.GET.dict())
+        # the cart context processor reads the session while rendering
+        await aget_cart(request)
 
         return render(
             request,
             "catalog/_variant_info.html",
             {"variant": variant, "cart_product_form": CartAddProductForm()},
         )
+
+
+def product_feed(request, fmt):
+    """Gzip-compressed marketplace feed of every variant.
+
+    Serves the last build of ``build_product_feeds`` and falls back to
+    streaming a fresh feed straight from the database when there is none
+    or it is older than ``FEED_MAX_AGE``.
+    """
+    if fmt not in FEEDS:
+        raise Http404
+    filename = f"products.{fmt}.gz"
+
+    manifest = get_manifest(fmt)
+    if (
+        manifest
+        and parse_datetime(manifest["built"])
+        > timezone.now() - timedelta(seconds=settings.FEED_MAX_AGE)
+        and default_storage.exists(manifest["name"])
+    ):
+        return FileResponse(
+            default_storage.open(manifest["name"]),
+            as_attachment=True,
+            filename=filename,
+            content_type="application/gzip",
+        )
+
+    response = StreamingHttpResponse(
+        gzip_stream(generate_feed(FEEDS[fmt]())), content_type="application/gzip"
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
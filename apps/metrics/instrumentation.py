@@ -0,0 +1,185 @@
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+import redis
+import redis.asyncio
+from django.template.backends.django import Template
+from prometheus_client import Histogram
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+
+REQUEST_DURATION = Histogram(
+    'django_request_duration_seconds',
+    'Wall time of a request.',
+    ['view', 'method', 'status'],
+    buckets=DURATION_BUCKETS,
+)
+SQL_QUERIES = Histogram(
+    'django_request_sql_queries',
+    'SQL queries executed per request.',
+    ['view'],
+    buckets=COUNT_BUCKETS,
+)
+SQL_DURATION = Histogram(
+    'django_request_sql_duration_seconds',
+    'Time spent in SQL per request.',
+    ['view'],
+    buckets=DURATION_BUCKETS,
+)
+REDIS_COMMANDS = Histogram(
+    'django_request_redis_commands',
+    'Redis round trips per request; a pipeline counts once.',
+    ['view'],
+    buckets=COUNT_BUCKETS,
+)
+REDIS_DURATION = Histogram(
+    'django_request_redis_duration_seconds',
+    'Time spent waiting on Redis per request.',
+    ['view'],
+    buckets=DURATION_BUCKETS,
+)
+TEMPLATE_DURATION = Histogram(
+    'django_request_template_duration_seconds',
+    'Time spent rendering templates per request.',
+    ['view'],
+    buckets=DURATION_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'django_response_size_bytes',
+    'Response body size.',
+    ['view'],
+    buckets=SIZE_BUCKETS,
+)
+
+_current = ContextVar('metrics_request_stats', default=None)
+
+
+class RequestStats:
+    """What one request spent in SQL, Redis and templates."""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        # SQL text -> [executions, total seconds]; params are not part of
+        # the text, so N+1 patterns collapse into one entry
+        self.queries = {}
+        self.redis_count = 0
+        self.redis_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def record_query(self, sql, duration):
+        self.sql_count += 1
+        self.sql_time += duration
+        entry = self.queries.setdefault(sql, [0, 0.0])
+        entry[0] += 1
+        entry[1] += duration
+
+    def top_queries(self, limit):
+        ranked = sorted(self.queries.items(), key=lambda item: item[1][1], reverse=True)
+        return ranked[:limit]
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_sql(execute, sql, params, many, context):
+    """Database execute wrapper, see connection.execute_wrapper()."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record_query(sql, perf_counter() - started)
+
+
+def _timed_redis(method):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        stats = _current.get()
+        if stats is None:
+            return method(*args, **kwargs)
+
+        started = perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stats.redis_count += 1
+            stats.redis_time += perf_counter() - started
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _timed_async_redis(method):
+    @wraps(method)
+    async def wrapper(*args, **kwargs):
+        stats = _current.get()
+        if stats is None:
+            return await method(*args, **kwargs)
+
+        started = perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            stats.redis_count += 1
+            stats.redis_time += perf_counter() - started
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _timed_render(method):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        stats = _current.get()
+        if stats is None:
+            return method(*args, **kwargs)
+
+        # render_to_string inside a template would be counted twice
+        stats.template_depth += 1
+        started = perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += perf_counter() - started
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+def install():
+    """Wrap the Redis client and template rendering once per process.
+
+    The wrappers only measure while a request is being recorded, so
+    Celery workers and management commands are unaffected.
+    """
+    if getattr(redis.Redis.execute_command, 'instrumented', False):
+        return
+    # Pipeline overrides execute_command to queue commands, so patching
+    # Redis does not count those; execute() is the round trip
+    redis.Redis.execute_command = _timed_redis(redis.Redis.execute_command)
+    redis.client.Pipeline.execute = _timed_redis(redis.client.Pipeline.execute)
+    redis.asyncio.Redis.execute_command = _timed_async_redis(
+        redis.asyncio.Redis.execute_command
+    )
+    redis.asyncio.client.Pipeline.execute = _timed_async_redis(
+        redis.asyncio.client.Pipeline.execute
+    )
+    Template.render = _timed_render(Template.render)
@@ -0,0 +1,120 @@
+import json
+import logging
+from contextlib import ExitStack
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import instrumentation as metrics
+
+logger = logging.getLogger('metrics.slow_requests')
+
+
+def _response_size(response):
+    if response.streaming:
+        size = response.get('Content-Length')
+        return int(size) if size else None
+    return len(response.content)
+
+
+class RequestMetricsMiddleware:
+    """Record timings of every request into the Prometheus histograms.
+
+    Requests slower than METRICS_SLOW_REQUEST_MS are also logged as one
+    JSON line with their most expensive queries.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_threshold = settings.METRICS_SLOW_REQUEST_MS / 1000
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        stats, token = metrics.start_request()
+        started = perf_counter()
+        try:
+            with self.record_queries():
+                response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self.observe(request, response, stats, perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = metrics.start_request()
+        started = perf_counter()
+        try:
+            # Async ORM calls and sync code of the request share one thread
+            # under ASGI; the wrappers have to be set on its connections.
+            queries = await sync_to_async(self.record_queries)()
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(queries.close)()
+        finally:
+            metrics.end_request(token)
+        self.observe(request, response, stats, perf_counter() - started)
+        return response
+
+    def record_queries(self):
+        """Wrap the current thread's connections; close the returned stack."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics.record_sql))
+        return stack
+
+    def observe(self, request, response, stats, duration):
+        match = request.resolver_match
+        # unresolved paths (404s, scanners) share one label
+        view = match.view_name if match else '<unresolved>'
+        size = _response_size(response)
+
+        metrics.REQUEST_DURATION.labels(
+            view, request.method, str(response.status_code)
+        ).observe(duration)
+        metrics.SQL_QUERIES.labels(view).observe(stats.sql_count)
+        metrics.SQL_DURATION.labels(view).observe(stats.sql_time)
+        metrics.REDIS_COMMANDS.labels(view).observe(stats.redis_count)
+        metrics.REDIS_DURATION.labels(view).observe(stats.redis_time)
+        metrics.TEMPLATE_DURATION.labels(view).observe(stats.template_time)
+        if size is not None:
+            metrics.RESPONSE_SIZE.labels(view).observe(size)
+
+        if duration >= self.slow_threshold:
+            self.log_slow_request(request, response, view, duration, size, stats)
+
+    def log_slow_request(self, request, response, view, duration, size, stats):
+        top_queries = [
+            {'sql': sql[:1000], 'count': count, 'ms': round(total * 1000, 2)}
+            for sql, (count, total) in stats.top_queries(
+                settings.METRICS_SLOW_REQUEST_QUERIES
+            )
+        ]
+        logger.warning(json.dumps({
+            'event': 'slow_request',
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': round(duration * 1000, 2),
+            'sql_count': stats.sql_count,
+            'sql_ms': round(stats.sql_time * 1000, 2),
+            'redis_count': stats.redis_count,
+            'redis_ms': round(stats.redis_time * 1000, 2),
+            'template_ms': round(stats.template_time * 1000, 2),
+            'bytes': size,
+            'top_queries': top_queries,
+        }))
@@ -0,0 +1,73 @@
+import hashlib
+import posixpath
+from io import BytesIO
+
+import weasyprint
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+
+INVOICE_DIR = "invoices"
+
+
+def get_invoice_dir(order_id):
+    return posixpath.join(INVOICE_DIR, str(order_id))
+
+
+def render_invoice_html(order):
+    return render_to_string("orders/order/pdf.html", {"order": order})
+
+
+def get_invoice_path(order, html=None):
+    """Storage path of the invoice for the current state of ``order``.
+
+    The name carries a hash of the rendered HTML, so any change to the
+    order (or to the template) yields a new path and a fresh render.
+    """
+    if html is None:
+        html = render_invoice_html(order)
+    digest = hashlib.sha256(html.encode()).hexdigest()[:16]
+    return posixpath.join(get_invoice_dir(order.id), f"{digest}.pdf")
+
+
+def get_stored_invoice(order, html=None):
+    """Return the stored PDF for the current state of ``order``, or None."""
+    path = get_invoice_path(order, html)
+    try:
+        with default_storage.open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def get_invoice_pdf(order):
+    """Return the invoice PDF bytes, rendering and storing it if needed."""
+    html = render_invoice_html(order)
+    pdf = get_stored_invoice(order, html)
+    if pdf is not None:
+        return pdf
+
+    out = BytesIO()
+    weasyprint.HTML(string=html).write_pdf(out)
+    pdf = out.getvalue()
+    path = get_invoice_path(order, html)
+    name = default_storage.save(path, ContentFile(pdf))
+    if name != path:
+        # a concurrent render stored the same invoice first; storages
+        # rename instead of overwriting, so drop the duplicate
+        default_storage.delete(name)
+    _remove_stale_invoices(order.id, keep=path)
+    return pdf
+
+
+def _remove_stale_invoices(order_id, keep):
+    """Delete invoices rendered for earlier states of the order."""
+    directory = get_invoice_dir(order_id)
+    digest = posixpath.splitext(posixpath.basename(keep))[0]
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        if not name.startswith(digest):
+            default_storage.delete(posixpath.join(directory, name))
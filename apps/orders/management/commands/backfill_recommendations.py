@@ -0,0 +1,51 @@
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand
+
+from catalog.recommender import Recommender, r
+from orders.models import OrderItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the Redis co-purchase recommendations from paid order items. "
+        "Existing scores and order markers are dropped first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of orders sent to Redis per pipeline.",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        recommender = Recommender()
+
+        # orders recorded before the markers existed, or whose marker
+        # expired, would be counted twice on top of the old scores
+        recommender.clear_purchases()
+
+        rows = (
+            OrderItem.objects.filter(order__paid=True)
+            .order_by("order_id")
+            .values_list("order_id", "variant__product_id")
+            .iterator(chunk_size=chunk_size * 10)
+        )
+
+        # orders recorded live while this runs are skipped by their marker
+        orders = 0
+        pipe = r.pipeline(transaction=False)
+        for order_id, items in groupby(rows, key=itemgetter(0)):
+            product_ids = [product_id for _, product_id in items]
+            recommender.order_products_bought(order_id, product_ids, pipe=pipe)
+            orders += 1
+            if orders % chunk_size == 0:
+                pipe.execute()
+                self.stdout.write(f"Replayed {orders} orders")
+        pipe.execute()
+
+        self.stdout.write(self.style.SUCCESS(f"Replayed {orders} paid orders"))
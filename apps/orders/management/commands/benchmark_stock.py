@@ -0,0 +1,206 @@
+import json
+import math
+import statistics
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from celery.app.task import Task
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+from catalog.models import Brand, Category, Product, ProductVariant
+from orders.models import Order
+from orders.services import OrderPlacementError, place_order
+
+BENCH_SLUG = "benchmark-stock"
+BENCH_EMAIL = "stock-benchmark@storefront.invalid"
+# consecutive database errors after which a buyer gives up
+MAX_RETRIES = 5
+
+ORDER_FORM = {
+    "first_name": "Bench",
+    "last_name": "Mark",
+    "email": BENCH_EMAIL,
+    "address": "1 Benchmark Street",
+    "postal_code": "00000",
+    "city": "Testville",
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class Buyer(threading.Thread):
+    """Places single-variant orders until the variant is sold out.
+
+    Database errors are retried up to MAX_RETRIES times in a row; after
+    that the buyer stops and keeps the last error in `failure`.
+    """
+
+    def __init__(self, variant_id, quantity, start):
+        super().__init__()
+        self.cart = SimpleNamespace(cart={str(variant_id): quantity}, coupon=None)
+        self.start_barrier = start
+        self.timings = []
+        self.sold_out = 0
+        self.errors = 0
+        self.failure = None
+
+    def run(self):
+        try:
+            self.start_barrier.wait()
+            retries = 0
+            while True:
+                started = time.perf_counter()
+                try:
+                    place_order(Order(**ORDER_FORM), self.cart)
+                except OrderPlacementError:
+                    self.sold_out += 1
+                    return
+                except DatabaseError as e:
+                    self.errors += 1
+                    retries += 1
+                    if retries > MAX_RETRIES:
+                        self.failure = e
+                        return
+                    continue
+                retries = 0
+                self.timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            # every thread has its own connection
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Let concurrent buyers race for the stock of one SKU and report "
+        "checkout throughput. Uses a dedicated benchmark product that is "
+        "removed afterwards; Celery tasks are not sent."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--buyers",
+            type=int,
+            action="append",
+            help="Concurrent buyers per run (repeatable, default 1, 4 and 16).",
+        )
+        parser.add_argument("--stock", type=int, default=500)
+        parser.add_argument(
+            "--quantity", type=int, default=1, help="Units bought per order."
+        )
+        parser.add_argument(
+            "--json",
+            dest="json_path",
+            help="Write the results as JSON to this file ('-' for stdout).",
+        )
+
+    def handle(self, *args, **options):
+        if options["stock"] < 1 or options["quantity"] < 1:
+            raise CommandError("--stock and --quantity must be at least 1.")
+        if connection.vendor != "postgresql":
+            self.stderr.write(
+                f"Running on {connection.vendor}, which serializes writers; "
+                "use PostgreSQL for meaningful numbers."
+            )
+
+        results = {}
+        # stand-in for the broker: order e-mails and Stripe syncs are dropped
+        with mock.patch.object(Task, "apply_async", lambda *args, **kwargs: None):
+            self.cleanup()
+            variant = self.create_variant()
+            try:
+                for buyers in options["buyers"] or [1, 4, 16]:
+                    results[buyers] = self.run(variant, buyers, options)
+            finally:
+                self.cleanup()
+
+        report = {
+            "meta": {
+                "database": connection.vendor,
+                "stock": options["stock"],
+                "quantity": options["quantity"],
+            },
+            "runs": results,
+        }
+        json_path = options["json_path"]
+        if json_path == "-":
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(report, f, indent=2)
+        self.write_table(results)
+
+    def create_variant(self):
+        category, _ = Category.objects.get_or_create(
+            slug=BENCH_SLUG, defaults={"name": "Stock benchmark"}
+        )
+        brand, _ = Brand.objects.get_or_create(
+            slug=BENCH_SLUG, defaults={"name": "Stock benchmark"}
+        )
+        product = Product.objects.create(
+            name="Stock benchmark", slug=BENCH_SLUG, category=category, brand=brand
+        )
+        return ProductVariant.objects.create(
+            product=product, price=10, sku=BENCH_SLUG.upper(), stock=0
+        )
+
+    def run(self, variant, buyers, options):
+        Order.objects.filter(email=BENCH_EMAIL).delete()
+        ProductVariant.objects.filter(id=variant.id).update(stock=options["stock"])
+
+        start = threading.Barrier(buyers + 1)
+        threads = [
+            Buyer(variant.id, options["quantity"], start) for _ in range(buyers)
+        ]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        failed = [thread.failure for thread in threads if thread.failure]
+        if failed:
+            raise CommandError(
+                f"{buyers} buyers: {len(failed)} gave up after {MAX_RETRIES} "
+                f"retries, last error: {failed[-1]}"
+            )
+        timings = [ms for thread in threads for ms in thread.timings]
+        orders = len(timings)
+        left = ProductVariant.objects.get(id=variant.id).stock
+        sold = options["stock"] - left
+        if sold != orders * options["quantity"]:
+            raise CommandError(
+                f"{buyers} buyers: {orders} orders but {sold} units left the stock."
+            )
+        return {
+            "orders": orders,
+            "orders_per_s": round(orders / elapsed, 1),
+            "p50_ms": round(percentile(timings, 50), 2) if timings else None,
+            "p95_ms": round(percentile(timings, 95), 2) if timings else None,
+            "mean_ms": round(statistics.fmean(timings), 2) if timings else None,
+            "stock_left": left,
+            "errors": sum(thread.errors for thread in threads),
+        }
+
+    def write_table(self, results):
+        columns = ["orders", "orders_per_s", "p50_ms", "p95_ms", "stock_left", "errors"]
+        self.stdout.write(f"{'buyers':<8}" + "".join(f"{c:>14}" for c in columns))
+        for buyers, row in results.items():
+            self.stdout.write(
+                f"{buyers:<8}" + "".join(f"{str(row[c]):>14}" for c in columns)
+            )
+
+    def cleanup(self):
+        Order.objects.filter(email=BENCH_EMAIL).delete()
+        Product.objects.filter(slug=BENCH_SLUG).delete()
+        Category.objects.filter(slug=BENCH_SLUG).delete()
+        Brand.objects.filter(slug=BENCH_SLUG).delete()
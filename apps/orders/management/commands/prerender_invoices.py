@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import Order
+from orders.tasks import render_invoice
+
+
+class Command(BaseCommand):
+    help = "Render and store invoice PDFs for existing orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--paid-only",
+            action="store_true",
+            help="Only render invoices of paid orders.",
+        )
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help="Render in this process instead of queueing Celery tasks.",
+        )
+
+    def handle(self, *args, **options):
+        orders = Order.objects.order_by("id")
+        if options["paid_only"]:
+            orders = orders.filter(paid=True)
+
+        # up-to-date invoices are found in storage and skipped by the task
+        total = 0
+        for order_id in orders.values_list("id", flat=True).iterator():
+            if options["sync"]:
+                render_invoice(order_id)
+            else:
+                render_invoice.delay(order_id)
+            total += 1
+            if total % 500 == 0:
+                self.stdout.write(f"Processed {total} orders")
+
+        action = "Rendered" if options["sync"] else "Queued"
+        self.stdout.write(self.style.SUCCESS(f"{action} {total} invoices"))
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:24
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+
+    subtotal = (
+        OrderItem.objects.filter(order=OuterRef("pk"))
+        .values("order")
+        .annotate(subtotal=Sum(F("price") * F("quantity")))
+        .values("subtotal")
+    )
+    Order.objects.update(
+        subtotal=Coalesce(
+            Subquery(subtotal, output_field=models.DecimalField()), Decimal(0)
+        )
+    )
+    Order.objects.filter(discount=0).update(total=F("subtotal"))
+
+    orders = Order.objects.exclude(discount=0).only("subtotal", "discount")
+    batch = []
+    for order in orders.iterator(chunk_size=1000):
+        order.discount_amount = (
+            order.subtotal * order.discount / Decimal(100)
+        ).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        order.total = order.subtotal - order.discount_amount
+        batch.append(order)
+        if len(batch) == 1000:
+            Order.objects.bulk_update(batch, ["discount_amount", "total"])
+            batch = []
+    Order.objects.bulk_update(batch, ["discount_amount", "total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "orders",
+            "0003_remove_orderitem_attributes_remove_orderitem_product_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="discount_amount",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=10
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="subtotal",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=10
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="total",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=10
+            ),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("coupons", "0001_initial"),
+        ("orders", "0004_order_totals"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["paid", "-created"], name="orders_orde_paid_98e2fa_idx"
+            ),
+        ),
+    ]
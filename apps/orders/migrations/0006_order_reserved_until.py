@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("coupons", "0001_initial"),
+        ("orders", "0005_order_paid_created_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="reserved_until",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("reserved_until__isnull", False)),
+                fields=["reserved_until"],
+                name="order_reserved_until_idx",
+            ),
+        ),
+    ]
@@ -1,9 +1,22 @@
 from django.conf import settings
 from django.db import models
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Decimal
+from django.db.models import F, Prefetch, Sum
 from django.core.validators import MinValueValidator, MaxValueValidator
 from coupons.models import Coupon
-from catalog.models import ProductVariant
+from catalog.models import AttributeValue, ProductVariant
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Load the items with everything invoices and the admin show."""
+        attributes = AttributeValue.objects.select_related("attribute")
+        items = OrderItem.objects.select_related("variant__product").prefetch_related(
+            Prefetch("variant__attributes", queryset=attributes)
+        )
+        return self.select_related("coupon").prefetch_related(
+            Prefetch("items", queryset=items.order_by("id"))
+        )
 
 
 class Order(models.Model):
@@ -19,19 +32,55 @@ class Order(models.Model):
     stripe_id = models.CharField(max_length=255, blank=True)
     coupon = models.ForeignKey(Coupon, related_name="orders", on_delete=models.SET_NULL, null=True, blank=True)
     discount = models.IntegerField(default=0, validators=[MinValueValidator(0), MaxValueValidator(100)])
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    # set while the unpaid order holds stock, see orders.services
+    reserved_until = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created"]
         indexes = [
             models.Index(fields=["-created"]),
+            # the admin changelist filters on paid in created order
+            models.Index(fields=["paid", "-created"]),
+            models.Index(
+                fields=["reserved_until"],
+                name="order_reserved_until_idx",
+                condition=models.Q(reserved_until__isnull=False),
+            ),
         ]
 
     def __str__(self):
         return f"Order {self.id}"
 
+    def save(self, *args, **kwargs):
+        self.set_totals(self.subtotal)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "discount" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "discount_amount", "total"}
+        super().save(*args, **kwargs)
+
+    def set_totals(self, subtotal):
+        """Set subtotal and derive the discount amount and total from it."""
+        self.subtotal = Decimal(subtotal)
+        self.discount_amount = (self.subtotal * self.discount / Decimal(100)).quantize(
+            Decimal("0.01"), rounding=ROUND_HALF_UP
+        )
+        self.total = self.subtotal - self.discount_amount
+
+    def update_totals(self):
+        """Recompute the stored totals from the order items."""
+        subtotal = self.items.aggregate(
+            subtotal=Sum(F("price") * F("quantity"))
+        )["subtotal"]
+        self.set_totals(subtotal or 0)
+        self.save(update_fields=["subtotal", "discount_amount", "total", "updated"])
+
     def get_total_cost(self):
-        total_cost = self.get_total_cost_before_discount()
-        return total_cost - self.get_discount()
+        return self.total
 
     def get_stripe_url(self):
         if not self.stripe_id:
@@ -44,13 +93,10 @@ class Order(models.Model):
         return f'https://dashboard.stripe.com{path}payments/{self.stripe_id}'
 
     def get_total_cost_before_discount(self):
-        return sum(item.get_cost() for item in self.items.all())
+        return self.subtotal
 
     def get_discount(self):
-        total_cost = self.get_total_cost_before_discount()
-        if self.discount:
-            return total_cost * (self.discount / Decimal(100))
-        return Decimal(0)
+        return self.discount_amount
 
 
 class OrderItem(models.Model):
@@ -0,0 +1,146 @@
+import logging
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from catalog.models import ProductVariant
+
+from .models import Order, OrderItem
+from .tasks import order_created
+
+logger = logging.getLogger(__name__)
+
+
+class OrderPlacementError(Exception):
+    pass
+
+
+def reservation_expiry():
+    return timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+
+
+def order_quantities(order_id):
+    """``{variant_id: quantity}`` of an order's items."""
+    return dict(
+        OrderItem.objects.filter(order_id=order_id)
+        .values("variant_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("variant_id", "total")
+    )
+
+
+def place_order(order, cart):
+    """Save an unsaved order together with all lines of the cart.
+
+    The order is priced from the current catalog, not the cart snapshot,
+    and holds the stock of its items until it is paid or the reservation
+    expires. Stock is taken last, so rows of popular variants stay locked
+    only until the commit. Follow-up tasks are queued once it committed.
+    """
+    quantities = {int(id): quantity for id, quantity in cart.cart.items()}
+    if not quantities:
+        raise OrderPlacementError("Your cart is empty.")
+
+    with transaction.atomic():
+        prices = dict(
+            ProductVariant.objects.filter(
+                id__in=quantities, available=True
+            ).values_list("id", "price")
+        )
+        if prices.keys() != quantities.keys():
+            raise OrderPlacementError(
+                "Some items in your cart are no longer available."
+            )
+
+        coupon = cart.coupon
+        if coupon:
+            order.coupon = coupon
+            order.discount = coupon.discount
+        order.subtotal = sum(
+            prices[variant_id] * quantity for variant_id, quantity in quantities.items()
+        )
+        order.reserved_until = reservation_expiry()
+        order.save()
+
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                variant_id=variant_id,
+                price=prices[variant_id],
+                quantity=quantity,
+            )
+            for variant_id, quantity in quantities.items()
+        )
+        if not ProductVariant.take_stock(quantities):
+            raise OrderPlacementError("Some items in your cart are sold out.")
+        transaction.on_commit(partial(order_created.delay, order.id))
+
+    return order
+
+
+def hold_stock(order):
+    """Extend the stock reservation of an unpaid order.
+
+    A reservation that was already released takes the stock again, raising
+    OrderPlacementError when it is gone. Paid orders are left alone.
+    """
+    expires = reservation_expiry()
+    unpaid = Order.objects.filter(id=order.id, paid=False)
+    with transaction.atomic():
+        if unpaid.filter(reserved_until__isnull=False).update(reserved_until=expires):
+            order.reserved_until = expires
+        elif unpaid.filter(reserved_until__isnull=True).update(reserved_until=expires):
+            if not ProductVariant.take_stock(order_quantities(order.id)):
+                raise OrderPlacementError("Some items in your order are sold out.")
+            order.reserved_until = expires
+
+
+def release_stock(order_id, reserved_before=None):
+    """Give back the stock held by an unpaid order.
+
+    The claim is a conditional UPDATE, so a payment confirmed concurrently
+    or a second release never returns the stock twice. With reserved_before
+    a reservation extended past that moment by a newer checkout is kept.
+    """
+    held = Order.objects.filter(id=order_id, paid=False, reserved_until__isnull=False)
+    if reserved_before is not None:
+        held = held.filter(reserved_until__lt=reserved_before)
+    with transaction.atomic():
+        released = held.update(reserved_until=None)
+        if released:
+            ProductVariant.return_stock(order_quantities(order_id))
+    return bool(released)
+
+
+def settle_stock(order):
+    """Turn the reservation of an order being paid into a sale.
+
+    Expects the order row to be locked. If the reservation lapsed before
+    the payment arrived the stock is taken again; when that fails too the
+    order is oversold and logged for follow-up.
+    """
+    if order.reserved_until is None:
+        try:
+            with transaction.atomic():
+                if not ProductVariant.take_stock(order_quantities(order.id)):
+                    raise OrderPlacementError
+        except OrderPlacementError:
+            logger.warning(
+                "Order %s was paid after its reservation lapsed and is oversold",
+                order.id,
+            )
+    order.reserved_until = None
+
+
+def release_expired_reservations():
+    now = timezone.now()
+    expired = Order.objects.filter(paid=False, reserved_until__lt=now).values_list(
+        "id", flat=True
+    )
+    return sum(
+        release_stock(order_id, reserved_before=now) for order_id in list(expired)
+    )
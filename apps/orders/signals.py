@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Order, OrderItem
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def order_item_changed(sender, instance, origin=None, **kwargs):
+    # items removed along with their order have nothing left to total
+    if isinstance(origin, Order) or getattr(origin, "model", None) is Order:
+        return
+    order = Order.objects.filter(pk=instance.order_id).first()
+    if order is not None:
+        order.update_totals()
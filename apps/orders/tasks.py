@@ -1,6 +1,9 @@
+import redis
 from celery import shared_task
 from django.core.mail import send_mail
-from .models import Order
+from catalog.recommender import Recommender
+from .invoices import get_invoice_pdf
+from .models import Order, OrderItem
 
 
 @shared_task
@@ -15,4 +18,31 @@ def order_created(order_id):
     mail_sent = send_mail(
         subject, message, 'admin@myshop.com', [order.email]
     )
-    return mail_sent
\ No newline at end of file
+    return mail_sent
+
+
+@shared_task(autoretry_for=(redis.RedisError,), retry_backoff=True, max_retries=5)
+def record_order_purchases(order_id):
+    """Feed a paid order into the co-purchase recommendations.
+
+    Keyed by order id, so a retried or duplicated task is counted once.
+    """
+    product_ids = OrderItem.objects.filter(order_id=order_id).values_list(
+        'variant__product_id', flat=True
+    )
+    Recommender().order_products_bought(order_id, product_ids)
+
+
+@shared_task
+def render_invoice(order_id):
+    """Render and store the invoice PDF unless it is already up to date."""
+    order = Order.objects.with_items().get(id=order_id)
+    get_invoice_pdf(order)
+
+
+@shared_task
+def release_expired_reservations():
+    """Return the stock of unpaid orders whose reservation ran out."""
+    from .services import release_expired_reservations
+
+    return release_expired_reservations()
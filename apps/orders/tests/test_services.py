@@ -0,0 +1,114 @@
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import connection
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from catalog.models import Brand, Category, Product, ProductVariant
+from coupons.models import Coupon
+from orders.models import Order, OrderItem
+from orders.services import OrderPlacementError, place_order
+
+ORDER_FORM = {
+    "first_name": "Test",
+    "last_name": "Buyer",
+    "email": "buyer@example.com",
+    "address": "1 Test Street",
+    "postal_code": "00000",
+    "city": "Testville",
+}
+
+
+class PlaceOrderConcurrencyTests(TransactionTestCase):
+    """Several checkouts of the same cart racing for one variant."""
+
+    buyers = 8
+
+    def setUp(self):
+        # Stripe price syncs are queued on commit of every variant save
+        with mock.patch("payment.signals.sync_stripe_prices"):
+            category = Category.objects.create(name="Keyboards", slug="keyboards")
+            brand = Brand.objects.create(name="Keychron", slug="keychron")
+            product = Product.objects.create(
+                name="Board", slug="board", category=category, brand=brand
+            )
+            self.variant = ProductVariant.objects.create(
+                product=product, price=Decimal("12.50"), sku="BOARD-1", stock=5
+            )
+        now = timezone.now()
+        coupon = Coupon.objects.create(
+            code="TEN",
+            valid_from=now - timedelta(days=1),
+            valid_to=now + timedelta(days=1),
+            discount=10,
+            active=True,
+        )
+        self.cart = SimpleNamespace(cart={str(self.variant.id): 2}, coupon=coupon)
+
+    def place_concurrently(self):
+        start = threading.Barrier(self.buyers)
+        results = []
+
+        def buy():
+            try:
+                start.wait()
+                results.append(place_order(Order(**ORDER_FORM), self.cart))
+            except Exception as exc:
+                results.append(exc)
+            finally:
+                # every thread has its own connection
+                connection.close()
+
+        with mock.patch("orders.services.order_created") as order_created:
+            threads = [threading.Thread(target=buy) for _ in range(self.buyers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(results), self.buyers)
+        placed = [result for result in results if isinstance(result, Order)]
+        failed = [result for result in results if not isinstance(result, Order)]
+        for exc in failed:
+            self.assertIsInstance(exc, OrderPlacementError)
+        return placed, order_created
+
+    def assert_orders_match_cart(self, placed, order_created):
+        # orders of failed checkouts must be rolled back with their items
+        self.assertCountEqual(
+            Order.objects.values_list("id", flat=True), [order.id for order in placed]
+        )
+        for order in Order.objects.all():
+            items = list(OrderItem.objects.filter(order=order))
+            self.assertEqual(len(items), 1)
+            self.assertEqual(items[0].variant_id, self.variant.id)
+            self.assertEqual(items[0].quantity, 2)
+            self.assertEqual(order.subtotal, Decimal("25.00"))
+            self.assertEqual(order.discount, 10)
+            self.assertEqual(order.total, Decimal("22.50"))
+            self.assertIsNotNone(order.reserved_until)
+
+        self.assertCountEqual(
+            [call.args for call in order_created.delay.call_args_list],
+            [(order.id,) for order in placed],
+        )
+
+    def test_limited_stock_is_never_oversold(self):
+        placed, order_created = self.place_concurrently()
+
+        self.assertEqual(len(placed), 2)
+        self.assert_orders_match_cart(placed, order_created)
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock, 1)
+
+    def test_untracked_stock_places_every_order(self):
+        ProductVariant.objects.filter(id=self.variant.id).update(stock=None)
+
+        placed, order_created = self.place_concurrently()
+
+        self.assertEqual(len(placed), self.buyers)
+        self.assert_orders_match_cart(placed, order_created)
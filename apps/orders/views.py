@@ -1,39 +1,33 @@
-import weasyprint
 from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
 from django.http import HttpResponse
-from django.template.loader import render_to_string
-from cart.cart import Cart
+from cart.cart import get_cart
 
 from .forms import OrderCreateForm
-from .models import OrderItem, Order
-from .tasks import order_created
+from .invoices import get_invoice_path, get_stored_invoice, render_invoice_html
+from .models import Order
+from .services import OrderPlacementError, place_order
+from .tasks import render_invoice
+
+# seconds the admin waits before asking again for an invoice being rendered
+INVOICE_RETRY_AFTER = 3
 
 
 def order_create(request):
-    cart = Cart(request)
+    cart = get_cart(request)
 
     if request.method == "POST":
         form = OrderCreateForm(request.POST)
         if form.is_valid():
-            order = form.save(commit=False)
-            if cart.coupon:
-                order.coupon = cart.coupon
-                order.discount = cart.coupon.discount
-            order.save()
-
-            for item in cart:
-                OrderItem.objects.create(
-                    order=order,
-                    variant=item["variant"],
-                    price=item["price"],
-                    quantity=item["quantity"],
-                )
-
-            order_created.delay(order.id)
-            request.session['order_id'] = order.id
-            return redirect("payment:process")
-            # return render(request, "orders/order/created.html", {"order": order})
+            try:
+                order = place_order(form.save(commit=False), cart)
+            except OrderPlacementError as e:
+                form.add_error(None, str(e))
+            else:
+                request.session['order_id'] = order.id
+                return redirect("payment:process")
+                # return render(request, "orders/order/created.html", {"order": order})
     else:
         form = OrderCreateForm()
 
@@ -41,16 +35,29 @@ def order_create(request):
 
 @staff_member_required
 def admin_order_detail(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(Order.objects.with_items(), id=order_id)
     return render(
         request, 'admin/orders/order/detail.html', {'order': order}
     )
 
 @staff_member_required
 def admin_order_pdf(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
-    html = render_to_string('orders/order/pdf.html', {'order': order})
-    response = HttpResponse(content_type='application/pdf')
+    order = get_object_or_404(Order.objects.with_items(), id=order_id)
+    html = render_invoice_html(order)
+    pdf = get_stored_invoice(order, html)
+    if pdf is None:
+        # rendering takes seconds, so a worker does it while the page retries
+        path = get_invoice_path(order, html)
+        if cache.add(f'orders:invoice_queued:{path}', 1, 60):
+            render_invoice.delay(order.id)
+        response = render(
+            request,
+            'admin/orders/order/pdf_pending.html',
+            {'order': order, 'retry_after': INVOICE_RETRY_AFTER},
+            status=202,
+        )
+        response['Retry-After'] = INVOICE_RETRY_AFTER
+        return response
+    response = HttpResponse(pdf, content_type='application/pdf')
     response['Content-Disposition'] = f'filename=order_{order.id}.pdf'
-    weasyprint.HTML(string=html).write_pdf(response)
     return response
\ No newline at end of file
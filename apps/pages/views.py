@@ -1,7 +1,7 @@
 from django.views.generic import TemplateView
 from django.shortcuts import render
-from django.db.models import Count, Min, Prefetch
-from catalog.models import Product, ProductImage
+from django.db.models import F
+from catalog.models import Product
 
 
 class IndexView(TemplateView):
@@ -10,13 +10,14 @@ class IndexView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        context['popular_products'] = Product.objects.annotate(
-            orders=Count('variants__order_items'),
-            min_price=Min('variants__price')
-        ).prefetch_related(
-            Prefetch('images', queryset=ProductImage.objects.filter(
-                is_main=True), to_attr='main_img_list')
-        ).order_by('-orders')[:4]
+        context['popular_products'] = Product.objects.select_related(
+            'category'
+        ).annotate(
+            orders=F('summary__orders_count'),
+            min_price=F('summary__min_price'),
+            main_image_url=F('summary__main_image_url'),
+            main_image_renditions=F('summary__main_image_renditions'),
+        ).order_by(F('orders').desc(nulls_last=True))[:4]
 
         return context
 
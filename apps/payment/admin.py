@@ -0,0 +1,40 @@
+from django.contrib import admin
+
+from .models import StripeCoupon, StripeEvent, StripePrice
+from .tasks import replay_events
+
+
+@admin.register(StripeCoupon)
+class StripeCouponAdmin(admin.ModelAdmin):
+    list_display = ["code", "percent_off", "stripe_id", "created"]
+    search_fields = ["code", "stripe_id"]
+
+
+@admin.register(StripePrice)
+class StripePriceAdmin(admin.ModelAdmin):
+    list_display = ["variant", "unit_amount", "stripe_price_id", "synced"]
+    list_select_related = ["variant__product"]
+    raw_id_fields = ["variant"]
+    search_fields = ["variant__sku", "stripe_product_id", "stripe_price_id"]
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ["event_id", "type", "status", "attempts", "received", "processed"]
+    list_filter = ["status", "type"]
+    search_fields = ["event_id"]
+    readonly_fields = [
+        "event_id",
+        "type",
+        "payload",
+        "attempts",
+        "last_error",
+        "received",
+        "processed",
+    ]
+    actions = ["replay"]
+
+    @admin.action(description="Replay selected events")
+    def replay(self, request, queryset):
+        count = replay_events(queryset)
+        self.message_user(request, f"Queued {count} events for processing.")
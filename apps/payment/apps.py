@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class PaymentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payment'
+
+    def ready(self):
+        import stripe
+        from django.conf import settings
+
+        from . import signals  # noqa: F401
+
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        stripe.api_version = settings.STRIPE_API_VERSION
+        stripe.api_base = settings.STRIPE_API_BASE
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+from functools import partial
+
+from django.db import transaction
+
+from catalog.models import ProductSummary
+from orders.models import Order
+from orders.services import release_stock, settle_stock
+from orders.tasks import record_order_purchases
+
+from .tasks import payment_completed
+
+
+def handle_checkout_session_completed(session):
+    if session["mode"] != "payment" or session["payment_status"] != "paid":
+        return
+
+    # raises Order.DoesNotExist, which the worker retries and then parks
+    order = Order.objects.select_for_update().get(id=session["client_reference_id"])
+    if order.paid:
+        # already handled through another event or a replay
+        return
+
+    settle_stock(order)
+    order.paid = True
+    order.stripe_id = session["payment_intent"] or ""
+    order.save()
+
+    product_ids = set(order.items.values_list("variant__product_id", flat=True))
+    ProductSummary.increment_orders(product_ids)
+    transaction.on_commit(partial(record_order_purchases.delay, order.id))
+    transaction.on_commit(partial(payment_completed.delay, order.id))
+
+
+def handle_checkout_session_expired(session):
+    # the customer can start a new checkout, which reserves the stock again
+    if session["mode"] != "payment":
+        return
+    # Sessions expire with the reservation they were created for (rounded
+    # down to the second). A newer checkout of the same order extends the
+    # reservation, which must outlive the session it replaced.
+    expires_at = datetime.fromtimestamp(session["expires_at"], tz=timezone.utc)
+    release_stock(
+        session["client_reference_id"],
+        reserved_before=expires_at + timedelta(seconds=1),
+    )
+
+
+HANDLERS = {
+    "checkout.session.completed": handle_checkout_session_completed,
+    "checkout.session.expired": handle_checkout_session_expired,
+}
+
+
+def handle_event(event):
+    """Apply a stored StripeEvent; events without a handler are no-ops."""
+    handler = HANDLERS.get(event.type)
+    if handler is not None:
+        handler(event.payload["data"]["object"])
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payment.models import StripeEvent
+from payment.tasks import replay_events
+
+
+class Command(BaseCommand):
+    help = "Reprocess stored Stripe webhook events."
+
+    def add_arguments(self, parser):
+        parser.add_argument("event_ids", nargs="*", help="Stripe event ids (evt_...)")
+        parser.add_argument(
+            "--failed",
+            action="store_true",
+            help="Replay every event the worker gave up on.",
+        )
+        parser.add_argument(
+            "--pending",
+            action="store_true",
+            help="Replay events that were never processed.",
+        )
+        parser.add_argument("--type", help="Only replay events of this type.")
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help="Process in this process instead of queueing Celery tasks.",
+        )
+
+    def handle(self, *args, **options):
+        statuses = []
+        if options["failed"]:
+            statuses.append(StripeEvent.Status.FAILED)
+        if options["pending"]:
+            statuses.append(StripeEvent.Status.PENDING)
+        if not options["event_ids"] and not statuses:
+            raise CommandError("Pass event ids, --failed or --pending.")
+
+        events = StripeEvent.objects.all()
+        if options["event_ids"]:
+            events = events.filter(event_id__in=options["event_ids"])
+        if statuses:
+            events = events.filter(status__in=statuses)
+        if options["type"]:
+            events = events.filter(type=options["type"])
+
+        count = replay_events(events, sync=options["sync"])
+        self.stdout.write(self.style.SUCCESS(f"Replayed {count} events"))
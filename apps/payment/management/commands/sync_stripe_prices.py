@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from payment.stripe_sync import sync_variant_prices
+
+
+class Command(BaseCommand):
+    help = "Create or update the Stripe products and prices of all variants."
+
+    def handle(self, *args, **options):
+        synced = sync_variant_prices()
+        self.stdout.write(self.style.SUCCESS(f"Synced {synced} variants with Stripe"))
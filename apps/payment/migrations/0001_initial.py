@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("catalog", "0005_image_renditions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StripePrice",
+            fields=[
+                (
+                    "variant",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stripe_price",
+                        serialize=False,
+                        to="catalog.productvariant",
+                    ),
+                ),
+                ("stripe_product_id", models.CharField(max_length=255)),
+                ("stripe_price_id", models.CharField(max_length=255)),
+                ("name", models.CharField(max_length=500)),
+                ("unit_amount", models.PositiveIntegerField()),
+                ("currency", models.CharField(default="usd", max_length=3)),
+                ("synced", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StripeCoupon",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("code", models.CharField(max_length=50)),
+                ("percent_off", models.PositiveIntegerField()),
+                ("stripe_id", models.CharField(max_length=255)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("code", "percent_off"), name="unique_stripe_coupon"
+                    )
+                ],
+            },
+        ),
+    ]
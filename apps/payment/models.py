@@ -0,0 +1,115 @@
+from django.db import IntegrityError, models, transaction
+import stripe
+
+from catalog.models import ProductVariant
+
+
+class StripeCoupon(models.Model):
+    """A Stripe coupon reused by every checkout with the same code and percent."""
+
+    code = models.CharField(max_length=50)
+    percent_off = models.PositiveIntegerField()
+    stripe_id = models.CharField(max_length=255)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["code", "percent_off"], name="unique_stripe_coupon"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.code} ({self.percent_off}%)"
+
+    @classmethod
+    def get_stripe_id(cls, code, percent_off):
+        coupon = cls.objects.filter(code=code, percent_off=percent_off).first()
+        if coupon:
+            return coupon.stripe_id
+
+        # the idempotency key makes concurrent first checkouts share one coupon
+        remote = stripe.Coupon.create(
+            name=code,
+            percent_off=percent_off,
+            duration="once",
+            idempotency_key=f"coupon-{code}-{percent_off}",
+        )
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    code=code, percent_off=percent_off, stripe_id=remote.id
+                )
+        except IntegrityError:
+            pass
+        return remote.id
+
+    @classmethod
+    async def aget_stripe_id(cls, code, percent_off):
+        coupon = await cls.objects.filter(code=code, percent_off=percent_off).afirst()
+        if coupon:
+            return coupon.stripe_id
+
+        remote = await stripe.Coupon.create_async(
+            name=code,
+            percent_off=percent_off,
+            duration="once",
+            idempotency_key=f"coupon-{code}-{percent_off}",
+        )
+        try:
+            # runs in autocommit, so a lost race needs no savepoint
+            await cls.objects.acreate(
+                code=code, percent_off=percent_off, stripe_id=remote.id
+            )
+        except IntegrityError:
+            pass
+        return remote.id
+
+
+class StripePrice(models.Model):
+    """Stripe product and price mirroring a variant, kept in sync by a task."""
+
+    variant = models.OneToOneField(
+        ProductVariant,
+        related_name="stripe_price",
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    stripe_product_id = models.CharField(max_length=255)
+    stripe_price_id = models.CharField(max_length=255)
+    name = models.CharField(max_length=500)
+    unit_amount = models.PositiveIntegerField()
+    currency = models.CharField(max_length=3, default="usd")
+    synced = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stripe price for variant {self.variant_id}"
+
+
+class StripeEvent(models.Model):
+    """A verified webhook event, stored once per Stripe event id."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        PROCESSED = "processed", "Processed"
+        FAILED = "failed", "Failed"
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received = models.DateTimeField(auto_now_add=True)
+    processed = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-received"]
+        indexes = [
+            models.Index(fields=["status", "received"]),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id}"
@@ -0,0 +1,23 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from catalog.models import Product, ProductVariant
+
+from .tasks import sync_stripe_prices
+
+
+@receiver(post_save, sender=ProductVariant)
+def variant_saved(sender, instance, **kwargs):
+    transaction.on_commit(partial(sync_stripe_prices.delay, [instance.id]))
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    # the product name is part of every variant's Stripe product name
+    if not created:
+        variant_ids = list(instance.variants.values_list("id", flat=True))
+        if variant_ids:
+            transaction.on_commit(partial(sync_stripe_prices.delay, variant_ids))
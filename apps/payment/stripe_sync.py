@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+import stripe
+from django.db.models import Prefetch
+
+from catalog.models import AttributeValue, ProductVariant
+
+from .models import StripePrice
+
+CURRENCY = "usd"
+
+
+def to_cents(amount):
+    return int(amount * Decimal("100"))
+
+
+def line_item_name(variant):
+    """Checkout label, e.g. "Board 75 (Color: Red, Switch: Brown)".
+
+    Expects ``product`` and ``attributes__attribute`` to be loaded.
+    """
+    attrs = ", ".join(
+        f"{av.attribute.name}: {av.value}" for av in variant.attributes.all()
+    )
+    name = variant.product.name
+    return f"{name} ({attrs})" if attrs else name
+
+
+def sync_variant_prices(variant_ids=None):
+    """Create or update the Stripe product and price of each variant.
+
+    Stripe prices are immutable, so a changed amount gets a new price;
+    a changed name only renames the product. Returns the number of
+    variants that needed a Stripe call.
+    """
+    variants = ProductVariant.objects.select_related(
+        "product", "stripe_price"
+    ).prefetch_related(
+        Prefetch(
+            "attributes",
+            queryset=AttributeValue.objects.select_related("attribute"),
+        )
+    )
+    if variant_ids is not None:
+        variants = variants.filter(id__in=variant_ids)
+
+    synced = 0
+    for variant in variants.iterator(chunk_size=200):
+        name = line_item_name(variant)
+        amount = to_cents(variant.price)
+        mapping = getattr(variant, "stripe_price", None)
+
+        if mapping is None:
+            product = stripe.Product.create(
+                name=name,
+                metadata={"variant_id": variant.id, "sku": variant.sku},
+                idempotency_key=f"variant-product-{variant.id}",
+            )
+            mapping = StripePrice(
+                variant=variant, stripe_product_id=product.id, name=name
+            )
+        elif mapping.name != name:
+            stripe.Product.modify(mapping.stripe_product_id, name=name)
+            mapping.name = name
+        elif mapping.unit_amount == amount:
+            continue
+
+        if mapping.unit_amount != amount or not mapping.stripe_price_id:
+            # keyed by the price it replaces, so a retried task reuses the
+            # price it created before failing instead of adding another
+            price = stripe.Price.create(
+                product=mapping.stripe_product_id,
+                unit_amount=amount,
+                currency=CURRENCY,
+                idempotency_key=(
+                    f"variant-price-{variant.id}-"
+                    f"{mapping.stripe_price_id or 'new'}-{amount}"
+                ),
+            )
+            mapping.stripe_price_id = price.id
+            mapping.unit_amount = amount
+        mapping.save()
+        synced += 1
+    return synced
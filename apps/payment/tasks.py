@@ -1,13 +1,17 @@
-from io import BytesIO
-import weasyprint
+import stripe
 from celery import shared_task
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from django.core.mail import EmailMessage
-from django.template.loader import render_to_string
+from orders.invoices import get_invoice_pdf
 from orders.models import Order
+from .models import StripeEvent
+from .stripe_sync import sync_variant_prices
 
 @shared_task
 def payment_completed(order_id):
-    order = Order.objects.get(id=order_id)
+    order = Order.objects.with_items().get(id=order_id)
     # create invoice e-mail
     subject = f'My Shop - Invoice no. {order.id}'
     message = (
@@ -16,14 +20,63 @@ def payment_completed(order_id):
     email = EmailMessage(
         subject, message, 'admin@myshop.com', [order.email]
     )
-    # generate PDF
-    html = render_to_string('orders/order/pdf.html', {'order': order})
-    out = BytesIO()
-    # stylesheets=[weasyprint.CSS(finders.find('css/pdf.css'))]
-    weasyprint.HTML(string=html).write_pdf(out)
-    # attach PDF file
+    # attach PDF file, rendered once and reused from storage
     email.attach(
-    f'order_{order.id}.pdf', out.getvalue(), 'application/pdf'
+    f'order_{order.id}.pdf', get_invoice_pdf(order), 'application/pdf'
     )
     # send e-mail
-    email.send()
\ No newline at end of file
+    email.send()
+
+
+@shared_task(
+    autoretry_for=(stripe.error.StripeError,), retry_backoff=True, max_retries=5
+)
+def sync_stripe_prices(variant_ids=None):
+    """Mirror variants as Stripe products/prices so checkout can reuse them."""
+    return sync_variant_prices(variant_ids)
+
+
+@shared_task(bind=True, max_retries=5)
+def process_stripe_event(self, event_id):
+    """Apply a stored webhook event once.
+
+    Failures are retried with exponential backoff; after the last retry
+    the event is marked failed and left for replay_stripe_events.
+    """
+    from .events import handle_event
+
+    try:
+        with transaction.atomic():
+            event = StripeEvent.objects.select_for_update().get(event_id=event_id)
+            if event.status == StripeEvent.Status.PROCESSED:
+                return
+            handle_event(event)
+            event.status = StripeEvent.Status.PROCESSED
+            event.attempts += 1
+            event.last_error = ''
+            event.processed = timezone.now()
+            event.save()
+    except Exception as exc:
+        final = self.request.retries >= self.max_retries
+        StripeEvent.objects.filter(event_id=event_id).update(
+            attempts=F('attempts') + 1,
+            last_error=repr(exc),
+            status=StripeEvent.Status.FAILED if final else StripeEvent.Status.PENDING,
+        )
+        if final:
+            return
+        raise self.retry(exc=exc, countdown=30 * 2 ** self.request.retries)
+
+
+def replay_events(queryset, sync=False):
+    """Reset the given events and process them again."""
+    event_ids = list(queryset.values_list('event_id', flat=True))
+    StripeEvent.objects.filter(event_id__in=event_ids).update(
+        status=StripeEvent.Status.PENDING, attempts=0, last_error=''
+    )
+    for event_id in event_ids:
+        if sync:
+            process_stripe_event.apply(args=(event_id,))
+        else:
+            process_stripe_event.delay(event_id)
+    return len(event_ids)
@@ -0,0 +1,66 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+
+from catalog.models import Brand, Category, Product, ProductVariant
+from orders.models import Order, OrderItem
+from orders.services import hold_stock
+from payment.events import handle_checkout_session_expired
+
+
+class CheckoutSessionExpiredTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Keyboards", slug="keyboards")
+        brand = Brand.objects.create(name="Keychron", slug="keychron")
+        product = Product.objects.create(
+            name="Board", slug="board", category=category, brand=brand
+        )
+        self.variant = ProductVariant.objects.create(
+            product=product, price=Decimal("12.50"), sku="BOARD-1", stock=5
+        )
+        self.order = Order.objects.create(
+            first_name="Test",
+            last_name="Buyer",
+            email="buyer@example.com",
+            address="1 Test Street",
+            postal_code="00000",
+            city="Testville",
+        )
+        OrderItem.objects.create(
+            order=self.order, variant=self.variant, price=self.variant.price, quantity=2
+        )
+        hold_stock(self.order)
+
+    def session(self):
+        # what payment_process sends to Stripe for the current reservation
+        return {
+            "mode": "payment",
+            "client_reference_id": self.order.id,
+            "expires_at": int(self.order.reserved_until.timestamp()),
+        }
+
+    def assert_stock(self, stock, reserved):
+        self.variant.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual(self.variant.stock, stock)
+        self.assertEqual(self.order.reserved_until is not None, reserved)
+
+    def test_current_session_releases_stock(self):
+        handle_checkout_session_expired(self.session())
+
+        self.assert_stock(5, reserved=False)
+
+    def test_replaced_session_keeps_reservation(self):
+        replaced = self.session()
+        later = self.order.reserved_until + timedelta(minutes=5)
+        with mock.patch("orders.services.reservation_expiry", return_value=later):
+            hold_stock(self.order)
+        current = self.session()
+
+        handle_checkout_session_expired(replaced)
+        self.assert_stock(3, reserved=True)
+
+        handle_checkout_session_expired(current)
+        self.assert_stock(5, reserved=False)
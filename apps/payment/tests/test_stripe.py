@@ -0,0 +1,225 @@
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+import stripe
+from django.conf import settings
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import Brand, Category, Product, ProductVariant
+from coupons.models import Coupon
+from orders.models import Order, OrderItem
+from payment.models import StripeCoupon, StripePrice
+from payment.stripe_sync import sync_variant_prices
+
+
+class StripeTestCase(TestCase):
+    """Stripe requests go to stripe-mock at settings.STRIPE_TEST_API_BASE.
+
+    The API methods in use are wrapped, so tests can check what was sent and
+    what came back.
+    """
+
+    def setUp(self):
+        for name, value in [
+            ("api_base", settings.STRIPE_TEST_API_BASE),
+            ("api_key", "sk_test_123"),
+        ]:
+            patcher = mock.patch.object(stripe, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.stripe = SimpleNamespace()
+        for name, resource, method in [
+            ("coupon_create", stripe.Coupon, "create"),
+            ("product_create", stripe.Product, "create"),
+            ("product_modify", stripe.Product, "modify"),
+            ("price_create", stripe.Price, "create"),
+            ("session_create", stripe.checkout.Session, "create"),
+        ]:
+            setattr(self.stripe, name, self.spy(resource, method))
+
+        category = Category.objects.create(name="Keyboards", slug="keyboards")
+        brand = Brand.objects.create(name="Keychron", slug="keychron")
+        product = Product.objects.create(
+            name="Board", slug="board", category=category, brand=brand
+        )
+        self.variant = ProductVariant.objects.create(
+            product=product, price=Decimal("12.50"), sku="BOARD-1"
+        )
+        now = timezone.now()
+        self.coupon = Coupon.objects.create(
+            code="TEN",
+            valid_from=now - timedelta(days=1),
+            valid_to=now + timedelta(days=1),
+            discount=10,
+            active=True,
+        )
+
+    def create_order(self):
+        order = Order.objects.create(
+            first_name="Test",
+            last_name="Buyer",
+            email="buyer@example.com",
+            address="1 Test Street",
+            postal_code="00000",
+            city="Testville",
+            coupon=self.coupon,
+            discount=self.coupon.discount,
+        )
+        OrderItem.objects.create(
+            order=order, variant=self.variant, price=self.variant.price, quantity=2
+        )
+        return order
+
+    def spy(self, resource, method):
+        send = getattr(resource, method)
+        results = []
+
+        def call(*args, **kwargs):
+            results.append(send(*args, **kwargs))
+            return results[-1]
+
+        patcher = mock.patch.object(resource, method, side_effect=call)
+        spy = patcher.start()
+        self.addCleanup(patcher.stop)
+        spy.results = results
+        return spy
+
+    def fail_once(self, spy, error):
+        """Fail the next call, e.g. with errors stripe-mock cannot produce."""
+        call = spy.side_effect
+        errors = [error]
+
+        def fail(*args, **kwargs):
+            if errors:
+                raise errors.pop()
+            return call(*args, **kwargs)
+
+        spy.side_effect = fail
+
+    def checkout(self, order):
+        session = self.client.session
+        session["order_id"] = order.id
+        session.save()
+        response = self.client.get(reverse("payment:process"))
+        self.assertRedirects(
+            response,
+            self.stripe.session_create.results[-1].url,
+            fetch_redirect_response=False,
+        )
+        return self.stripe.session_create.call_args.kwargs
+
+    def synced_price_id(self):
+        return StripePrice.objects.get(variant=self.variant).stripe_price_id
+
+
+class CheckoutTests(StripeTestCase):
+    def test_checkout_uses_synced_price(self):
+        sync_variant_prices([self.variant.id])
+
+        session = self.checkout(self.create_order())
+
+        self.assertEqual(
+            session["line_items"], [{"price": self.synced_price_id(), "quantity": 2}]
+        )
+
+    def test_second_checkout_reuses_coupon_and_price(self):
+        sync_variant_prices([self.variant.id])
+
+        first = self.checkout(self.create_order())
+        second = self.checkout(self.create_order())
+
+        self.assertEqual(self.stripe.coupon_create.call_count, 1)
+        self.assertEqual(self.stripe.product_create.call_count, 1)
+        self.assertEqual(self.stripe.price_create.call_count, 1)
+        coupon_id = self.stripe.coupon_create.results[0].id
+        for session in (first, second):
+            self.assertEqual(session["discounts"], [{"coupon": coupon_id}])
+            self.assertEqual(
+                session["line_items"],
+                [{"price": self.synced_price_id(), "quantity": 2}],
+            )
+        self.assertEqual(StripeCoupon.objects.get().stripe_id, coupon_id)
+
+    def test_unsynced_variant_falls_back_to_price_data(self):
+        session = self.checkout(self.create_order())
+
+        (line_item,) = session["line_items"]
+        self.assertNotIn("price", line_item)
+        self.assertEqual(line_item["price_data"]["unit_amount"], 1250)
+
+
+class IdempotencyTests(StripeTestCase):
+    def test_coupon_key_is_stable_across_retries(self):
+        self.fail_once(
+            self.stripe.coupon_create,
+            stripe.error.APIConnectionError("connection reset"),
+        )
+
+        with self.assertRaises(stripe.error.APIConnectionError):
+            StripeCoupon.get_stripe_id("TEN", 10)
+        self.assertEqual(
+            StripeCoupon.get_stripe_id("TEN", 10),
+            self.stripe.coupon_create.results[0].id,
+        )
+
+        first, retry = self.stripe.coupon_create.call_args_list
+        self.assertEqual(
+            first.kwargs["idempotency_key"], retry.kwargs["idempotency_key"]
+        )
+
+    def test_price_sync_keys_are_stable_across_retries(self):
+        self.fail_once(
+            self.stripe.price_create,
+            stripe.error.APIConnectionError("connection reset"),
+        )
+
+        with self.assertRaises(stripe.error.APIConnectionError):
+            sync_variant_prices([self.variant.id])
+        self.assertFalse(StripePrice.objects.exists())
+        sync_variant_prices([self.variant.id])
+
+        for create in (self.stripe.product_create, self.stripe.price_create):
+            first, retry = create.call_args_list
+            self.assertEqual(
+                first.kwargs["idempotency_key"], retry.kwargs["idempotency_key"]
+            )
+        self.assertEqual(self.synced_price_id(), self.stripe.price_create.results[0].id)
+
+
+class PriceChangeTests(StripeTestCase):
+    def test_price_change_creates_new_price(self):
+        sync_variant_prices([self.variant.id])
+        self.variant.price = Decimal("15.00")
+        self.variant.save()
+
+        self.assertEqual(sync_variant_prices([self.variant.id]), 1)
+
+        mapping = StripePrice.objects.get()
+        self.assertEqual(
+            mapping.stripe_price_id, self.stripe.price_create.results[1].id
+        )
+        self.assertEqual(mapping.unit_amount, 1500)
+        self.assertEqual(self.stripe.product_create.call_count, 1)
+        created = self.stripe.price_create.call_args.kwargs
+        self.assertEqual(created["product"], self.stripe.product_create.results[0].id)
+        self.assertEqual(created["unit_amount"], 1500)
+        self.assertNotEqual(
+            created["idempotency_key"],
+            self.stripe.price_create.call_args_list[0].kwargs["idempotency_key"],
+        )
+
+        session = self.checkout(self.create_order())
+        self.assertEqual(
+            session["line_items"], [{"price": mapping.stripe_price_id, "quantity": 2}]
+        )
+
+    def test_unchanged_variant_is_skipped(self):
+        sync_variant_prices([self.variant.id])
+
+        self.assertEqual(sync_variant_prices([self.variant.id]), 0)
+        self.assertEqual(self.stripe.price_create.call_count, 1)
@@ -1,10 +1,15 @@
+from django.conf import settings
 from django.urls import path
 from . import views, webhooks
 
 app_name = 'payment'
 
 urlpatterns = [
-    path('process/', views.payment_process, name='process'),
+    path(
+        'process/',
+        views.payment_process_async if settings.ASYNC_VIEWS else views.payment_process,
+        name='process',
+    ),
     path('completed/', views.payment_completed, name='completed'),
     path('canceled/', views.payment_canceled, name='canceled'),
     path('webhook/', webhooks.stripe_webhook, name='stripe-webhook'),
@@ -1,19 +1,69 @@
-from decimal import Decimal
 import stripe
-from django.conf import settings
-from django.shortcuts import get_object_or_404, redirect, render
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.urls import reverse
+from catalog.models import AttributeValue
 from orders.models import Order
-from cart.cart import Cart
+from orders.services import OrderPlacementError, hold_stock
+from cart.cart import get_cart
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-stripe.api_version = settings.STRIPE_API_VERSION
+from .models import StripeCoupon
+from .stripe_sync import CURRENCY, line_item_name, to_cents
 
 
 def payment_process(request):
     order_id = request.session.get('order_id')
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(Order.objects.select_related('coupon'), id=order_id)
+    try:
+        hold_stock(order)
+    except OrderPlacementError as e:
+        return _unavailable(request, e)
 
+    session_data = _checkout_session(request, order, _order_items(order))
+    if order.coupon:
+        coupon_id = StripeCoupon.get_stripe_id(order.coupon.code, order.discount)
+        session_data['discounts'] = [{'coupon': coupon_id}]
+
+    session = stripe.checkout.Session.create(**session_data)
+    return redirect(session.url, code=303)
+
+
+async def payment_process_async(request):
+    """payment_process for ASGI: Stripe is called with its async client."""
+    order_id = await request.session.aget('order_id')
+    order = await aget_object_or_404(Order.objects.select_related('coupon'), id=order_id)
+    try:
+        # transactions need a sync connection
+        await sync_to_async(hold_stock)(order)
+    except OrderPlacementError as e:
+        return _unavailable(request, e)
+
+    items = [item async for item in _order_items(order)]
+    session_data = _checkout_session(request, order, items)
+    if order.coupon:
+        coupon_id = await StripeCoupon.aget_stripe_id(order.coupon.code, order.discount)
+        session_data['discounts'] = [{'coupon': coupon_id}]
+
+    session = await stripe.checkout.Session.create_async(**session_data)
+    return redirect(session.url, code=303)
+
+
+def _unavailable(request, error):
+    return render(
+        request, 'payment/unavailable.html', {'error': str(error)}, status=409
+    )
+
+
+def _order_items(order):
+    return order.items.select_related(
+        'variant__product', 'variant__stripe_price'
+    ).prefetch_related(
+        Prefetch('variant__attributes', queryset=AttributeValue.objects.select_related('attribute'))
+    )
+
+
+def _checkout_session(request, order, items):
     success_url = request.build_absolute_uri(reverse('payment:completed'))
     cancel_url = request.build_absolute_uri(reverse('payment:canceled'))
 
@@ -24,41 +74,34 @@ def payment_process(request):
         'cancel_url': cancel_url,
         'line_items': []
     }
+    if order.reserved_until:
+        # no payments once the stock has been released
+        session_data['expires_at'] = int(order.reserved_until.timestamp())
 
-    for item in order.items.all():
-        product_name = item.variant.product.name
-
-        attrs = ", ".join([f"{av.attribute.name}: {av.value}" for av in item.variant.attributes.all()])
-
-        full_description = f"{product_name} ({attrs})" if attrs else product_name
+    for item in items:
+        unit_amount = to_cents(item.price)
+        mapping = getattr(item.variant, 'stripe_price', None)
 
-        session_data['line_items'].append(
-            {
+        # reuse the synced Stripe price when it still matches the order
+        if mapping and mapping.unit_amount == unit_amount:
+            line_item = {'price': mapping.stripe_price_id}
+        else:
+            line_item = {
                 'price_data': {
-                    'unit_amount': int(item.price * Decimal('100')),
-                    'currency': 'usd',
+                    'unit_amount': unit_amount,
+                    'currency': CURRENCY,
                     'product_data': {
-                        'name': full_description,
+                        'name': line_item_name(item.variant),
                     },
                 },
-                'quantity': item.quantity,
             }
-        )
-
-    if order.coupon:
-        stripe_coupon = stripe.Coupon.create(
-            name=order.coupon.code,
-            percent_off=order.discount,
-            duration='once'
-        )
-        session_data['discounts'] = [{'coupon': stripe_coupon.id}]
-
-    session = stripe.checkout.Session.create(**session_data)
-    return redirect(session.url, code=303)
+        line_item['quantity'] = item.quantity
+        session_data['line_items'].append(line_item)
+    return session_data
 
 
 def payment_completed(request):
-    cart = Cart(request)
+    cart = get_cart(request)
     cart.clear()
     return render(request, 'payment/completed.html')
 
@@ -1,16 +1,19 @@
+import json
+from functools import partial
+
 import stripe
 from django.conf import settings
+from django.db import transaction
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from orders.models import Order
-from .tasks import payment_completed
-from catalog.models import Product
-from catalog.recommender import Recommender
+from .models import StripeEvent
+from .tasks import process_stripe_event
+
 
 @csrf_exempt
 def stripe_webhook(request):
     payload = request.body
-    sig_header = request.META['HTTP_STRIPE_SIGNATURE']
+    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
     event = None
 
     try:
@@ -22,28 +25,14 @@ def stripe_webhook(request):
     except stripe.error.SignatureVerificationError as e:
         return HttpResponse(status=400)
 
-    if event.type == 'checkout.session.completed':
-        session = event.data.object
-        if (
-                session.mode == 'payment'
-                and session.payment_status == 'paid'
-        ):
-            try:
-                order = Order.objects.get(
-                    id=session.client_reference_id
-                )
-            except Order.DoesNotExist:
-                return HttpResponse(status=404)
-
-            order.paid = True
-            order.stripe_id = session.payment_intent
-            order.save()
-
-            product_ids = order.items.values_list('variant__product_id', flat=True)
-            products = Product.objects.filter(id__in=product_ids)
-            r = Recommender()
-            r.products_bought(products)
-
-            payment_completed.delay(order.id)
+    # Store and enqueue only; the worker does the actual processing.
+    # Redeliveries of a known event id are acknowledged without a new task.
+    with transaction.atomic():
+        _, created = StripeEvent.objects.get_or_create(
+            event_id=event.id,
+            defaults={'type': event.type, 'payload': json.loads(payload)},
+        )
+        if created:
+            transaction.on_commit(partial(process_stripe_event.delay, event.id))
 
-    return HttpResponse(status=200)
\ No newline at end of file
+    return HttpResponse(status=200)
@@ -0,0 +1,41 @@
+# Picked up automatically by gunicorn from the working directory.
+
+# Import Django in the master so workers fork with the app (and the
+# catalog taxonomy snapshot) already in memory.
+preload_app = True
+
+
+def when_ready(server):
+    from django.core.cache import cache
+    from django.db import connections
+
+    from catalog.taxonomy import load
+
+    try:
+        load()
+    except Exception:
+        # workers fall back to loading the snapshot on first use
+        server.log.exception("Could not preload the catalog taxonomy")
+    # connections opened by the master must not be shared with workers
+    connections.close_all()
+    cache.close()
+
+
+def on_starting(server):
+    import os
+    import shutil
+
+    # metrics files of a previous run would be merged into the new one
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def child_exit(server, worker):
+    import os
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)